@@ -0,0 +1,211 @@
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
+from db_config import call_options
+from time_keys import add_time_keys
+from analytics import RollingAnalytics
+from compaction import summaries_to_frame, SUMMARY_COLLECTION
+from firebase_admin import firestore
+
+CHART_DAYS = 30
+BURN_WINDOW_DAYS = 28       # Trailing window for each project's burn rate
+PROJECT_COLUMNS = ["project_id", "project_name", "pillar_id", "budget", "status", "quarter", "visibility"]
+
+def load_frames(db):
+    """Fetches Logs and Projects: returns (df_logs, projects_data)."""
+    # 1. Fetch Projects
+    projects_ref = db.collection("projects").stream(**call_options())
+    projects_data = {}
+    for doc in projects_ref:
+        d = doc.to_dict()
+        projects_data[doc.id] = {
+            "project_name": d.get("name"),
+            "pillar_id": d.get("pillar_id"),
+            "budget": d.get("total_hours_budget", 0),
+            "status": d.get("status", "Active"),
+            "quarter": d.get("quarter", "Top Priority"), # Default if missing
+            "visibility": d.get("visibility", True) # Default Visible
+        }
+
+    # 2. Fetch Work Logs
+    logs_ref = db.collection("work_logs").order_by("date", direction=firestore.Query.DESCENDING).stream(**call_options())
+    logs_list = []
+    for doc in logs_ref:
+        d = doc.to_dict()
+        # Add doc ID for deletion
+        d["id"] = doc.id
+        logs_list.append(d)
+
+    df_logs = pd.DataFrame(logs_list)
+    if not df_logs.empty:
+        df_logs["log_count"] = 1
+        df_logs["compacted"] = False
+
+    # 3. Compacted history: closed months come from monthly summaries as one row per project-day
+    summary_docs = [doc.to_dict() for doc in db.collection(SUMMARY_COLLECTION).stream(**call_options())]
+    df_summaries = summaries_to_frame(summary_docs)
+    if not df_summaries.empty:
+        df_logs = pd.concat([df_logs, df_summaries], ignore_index=True) if not df_logs.empty else df_summaries
+
+    # 4. Merge Data
+    if not df_logs.empty and projects_data:
+        df_logs["pillar_id"] = df_logs["project_id"].map(lambda x: projects_data.get(x, {}).get("pillar_id", "Unknown"))
+
+    # 5. Time keys (derived for legacy logs written before they were stored)
+    df_logs = add_time_keys(df_logs)
+
+    return df_logs, projects_data
+
+class DataSnapshot:
+    """One load of the logs and projects, shared read-only by every session in the process.
+
+    `logs` hands out a shallow view of the shared frame. Under pandas 3's
+    Copy-on-Write, deriving from it costs no copy and any write to it copies
+    first, so it never reaches the shared data. `versions` are the cache
+    versions the load reflects.
+    """
+    def __init__(self, df_logs, projects_data, versions=None):
+        self._logs = df_logs
+        self._projects = MappingProxyType({pid: MappingProxyType(dict(data)) for pid, data in projects_data.items()})
+        self.versions = MappingProxyType(dict(versions or {}))
+
+    @property
+    def logs(self):
+        return self._logs.copy(deep=False)
+
+    @property
+    def projects(self):
+        return self._projects
+
+class Aggregates:
+    """The precomputed tables behind the dashboard, quarterly view and AI context.
+
+    `tables` maps a name to a small DataFrame; `meta` carries the day_key the
+    figures are for and, when published by the worker, its version and the
+    cache versions of the data it was computed from.
+    """
+    def __init__(self, tables, meta):
+        self.tables = tables
+        self.meta = meta
+
+    def table(self, name):
+        return self.tables[name]
+
+    @property
+    def kpis(self):
+        return self.tables["kpis"].iloc[0].to_dict()
+
+    def projects_data(self):
+        """Rebuilds the project_id -> fields dict that get_all_data() returns."""
+        projects = self.tables["projects"]
+        return {row["project_id"]: {k: row[k] for k in PROJECT_COLUMNS[1:]} for row in projects.to_dict("records")}
+
+    def burn(self):
+        """project_id -> forecast row from compute_burn()."""
+        return {row["project_id"]: row for row in self.tables["burn"].to_dict("records")}
+
+    def project_hours(self):
+        return dict(zip(self.tables["project_hours"]["project_id"], self.tables["project_hours"]["hours"]))
+
+def compute_burn(projects, spent, trailing, day_key, window_days=BURN_WINDOW_DAYS):
+    """Budget forecast for every project at once.
+
+    `spent` and `trailing` are hours per project_id, all-time and over the last
+    `window_days`. Returns one row per project: its burn rate, the day the
+    budget runs out at that rate (None if it isn't burning or is already over)
+    and the slack left at the end of the current quarter (negative: it
+    overruns by then).
+    """
+    today = pd.Timestamp(day_key)
+    days_left_in_quarter = (today.to_period("Q").end_time.normalize() - today).days + 1
+
+    ids = projects["project_id"]
+    budget = pd.to_numeric(projects["budget"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    spent = spent.reindex(ids, fill_value=0.0).to_numpy(dtype=float)
+    per_day = trailing.reindex(ids, fill_value=0.0).to_numpy(dtype=float) / window_days
+    remaining = budget - spent
+
+    has_budget = budget > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_to_overrun = np.ceil(remaining / per_day)
+    days_to_overrun = np.where(has_budget & (remaining > 0) & np.isfinite(days_to_overrun), days_to_overrun, np.nan)
+    overrun = today + pd.to_timedelta(days_to_overrun, unit="D")
+    return pd.DataFrame({
+        "project_id": ids.to_numpy(),
+        "spent": spent,
+        "budget": budget,
+        "burn_per_week": per_day * 7,
+        "remaining": np.where(has_budget, remaining, np.nan),
+        "overrun_date": pd.Series(overrun.strftime("%Y-%m-%d"), dtype=object).where(~np.isnan(days_to_overrun), None).to_numpy(),
+        "quarter_slack": np.where(has_budget, remaining - per_day * days_left_in_quarter, np.nan),
+    })
+
+def compute_aggregates(df_logs, projects_data, keys, now=None):
+    """Every aggregate the render paths need, in one pass over the logs frame. Never mutates `df_logs`."""
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+    projects = pd.DataFrame(
+        [{"project_id": pid, **{k: data.get(k) for k in PROJECT_COLUMNS[1:]}} for pid, data in projects_data.items()],
+        columns=PROJECT_COLUMNS,
+    )
+    kpis = {
+        "has_logs": not df_logs.empty,
+        "today_hours": 0.0,
+        "week_hours": 0.0,
+        "week_focus": float("nan"),
+        "debt_hours": 0.0,
+        "top_project_week": "None",
+        "hours_7d": 0.0,
+        "hours_30d": 0.0,
+        "hours_90d": 0.0,
+        "focus_30d": float("nan"),
+        "streak": 0,
+        "best_streak": 0,
+    }
+    if df_logs.empty:
+        return Aggregates({
+            "kpis": pd.DataFrame([kpis]),
+            "project_hours": pd.DataFrame(columns=["project_id", "hours"]),
+            "daily_pillar": pd.DataFrame(columns=["day", "pillar_id", "hours"]),
+            "quarter_projects": pd.DataFrame(columns=["quarter_key", "project_name", "hours"]),
+            "projects": projects,
+            "burn": compute_burn(projects, pd.Series(dtype=float), pd.Series(dtype=float), keys["day_key"]),
+            "pillar_30d": pd.DataFrame(columns=["pillar_id", "hours"]),
+        }, {"day_key": keys["day_key"]})
+
+    count = df_logs["log_count"].fillna(1) if "log_count" in df_logs.columns else pd.Series(1, index=df_logs.index)
+    week = df_logs["iso_week"] == keys["iso_week"]
+    df_week = df_logs[week]
+    kpis["today_hours"] = float(df_logs.loc[df_logs["day_key"] == keys["day_key"], "hours"].sum())
+    kpis["week_hours"] = float(df_week["hours"].sum())
+    if not df_week.empty:
+        focus = pd.to_numeric(df_week["focus_score"], errors="coerce")
+        weights = count[week].where(focus.notna(), 0)
+        kpis["week_focus"] = float((focus.fillna(0) * weights).sum() / weights.sum()) if weights.sum() else float("nan")
+        kpis["top_project_week"] = df_week.groupby("project_name")["hours"].sum().idxmax()
+    kpis["debt_hours"] = float(df_logs.loc[df_logs["pillar_id"].str.contains("Debt", case=False, na=False), "hours"].sum())
+
+    # Rolling windows and streaks, ending on the current day
+    engine = RollingAnalytics.from_frame(df_logs, keys["day_key"])
+    for days in (7, 30, 90):
+        kpis[f"hours_{days}d"] = float(engine.hours(days))
+    focus_30 = engine.avg_focus(30)
+    kpis["focus_30d"] = float(focus_30) if focus_30 is not None else float("nan")
+    kpis["streak"] = engine.current_streak()
+    kpis["best_streak"] = engine.best_streak
+    pillar_30d = pd.DataFrame(sorted(engine.pillar_hours(30).items(), key=lambda x: -x[1]), columns=["pillar_id", "hours"])
+
+    dates = pd.to_datetime(df_logs["date"], utc=True)
+    recent = dates >= now - pd.Timedelta(days=CHART_DAYS)
+    daily_pillar = (df_logs[recent].groupby(["day_key", "pillar_id"])["hours"].sum()
+                    .reset_index().rename(columns={"day_key": "day"}))
+    project_hours = df_logs.groupby("project_id")["hours"].sum()
+    trailing = df_logs[dates >= now - pd.Timedelta(days=BURN_WINDOW_DAYS)].groupby("project_id")["hours"].sum()
+    return Aggregates({
+        "kpis": pd.DataFrame([kpis]),
+        "project_hours": project_hours.reset_index(),
+        "daily_pillar": daily_pillar,
+        "quarter_projects": df_logs.groupby(["quarter_key", "project_name"])["hours"].sum().reset_index(),
+        "projects": projects,
+        "burn": compute_burn(projects, project_hours, trailing, keys["day_key"]),
+        "pillar_30d": pillar_30d,
+    }, {"day_key": keys["day_key"]})
@@ -0,0 +1,229 @@
+import datetime
+import threading
+from collections import defaultdict
+import pandas as pd
+
+WINDOWS = (7, 30, 90)
+DEEP_WORK_DAY_HOURS = 1.0  # A day counts toward the streak once it reaches this many hours
+
+def day_ordinal(day_key):
+    return datetime.date.fromisoformat(day_key).toordinal()
+
+class _Stats:
+    """Running hours / focus sum / log count."""
+    __slots__ = ("hours", "focus", "count")
+
+    def __init__(self):
+        self.hours = 0.0
+        self.focus = 0.0
+        self.count = 0
+
+    def add(self, hours, focus, count, sign=1):
+        self.hours += sign * hours
+        self.focus += sign * focus
+        self.count += sign * count
+
+    def merge(self, other, sign=1):
+        self.add(other.hours, other.focus, other.count, sign)
+
+class _Bucket:
+    """All logs of one day: totals plus per-project and per-pillar splits."""
+    def __init__(self):
+        self.total = _Stats()
+        self.by_project = defaultdict(_Stats)
+        self.by_pillar = defaultdict(_Stats)
+
+    def add(self, project_id, pillar_id, hours, focus, sign=1):
+        self.total.add(hours, focus, 1, sign)
+        self.by_project[project_id].add(hours, focus, 1, sign)
+        self.by_pillar[pillar_id].add(hours, focus, 1, sign)
+
+class _Window:
+    """Running sums over the days [lo, hi]."""
+    def __init__(self, days):
+        self.days = days
+        self.lo = None
+        self.hi = None
+        self.total = _Stats()
+        self.by_project = defaultdict(_Stats)
+        self.by_pillar = defaultdict(_Stats)
+
+    def apply(self, bucket, sign=1):
+        self.total.merge(bucket.total, sign)
+        for pid, s in bucket.by_project.items():
+            self.by_project[pid].merge(s, sign)
+        for pil, s in bucket.by_pillar.items():
+            self.by_pillar[pil].merge(s, sign)
+
+    def reset(self):
+        self.total = _Stats()
+        self.by_project = defaultdict(_Stats)
+        self.by_pillar = defaultdict(_Stats)
+
+class RollingAnalytics:
+    """Incrementally maintained 7/30/90-day metrics and deep-work streaks.
+
+    Logs are folded into per-day buckets; each window keeps running sums and
+    only touches the days that enter or leave it as "today" moves, so adding
+    a log and advancing the clock are O(1) amortized and every query is O(1).
+    """
+    def __init__(self, windows=WINDOWS, streak_hours=DEEP_WORK_DAY_HOURS):
+        self._lock = threading.RLock()
+        self.streak_hours = streak_hours
+        self.windows = {days: _Window(days) for days in windows}
+        self.max_days = max(windows)
+        self.buckets = {}                   # day ordinal -> _Bucket (recent days only)
+        self.day_hours = defaultdict(float) # day ordinal -> hours (all history, for streaks)
+        self.today = None
+        self.streak_end = None
+        self.streak_len = 0
+        self.best_streak = 0
+
+    # --- Clock ---
+
+    def advance(self, today):
+        """Moves every window so it ends on `today` (a day ordinal)."""
+        with self._lock:
+            if self.today is not None and today <= self.today:
+                return
+            for w in self.windows.values():
+                new_lo, new_hi = today - w.days + 1, today
+                if w.hi is None or new_lo > w.hi:
+                    # First use or a long gap: rebuild from the (few) buckets in range.
+                    w.reset()
+                    for d in range(new_lo, new_hi + 1):
+                        if d in self.buckets:
+                            w.apply(self.buckets[d])
+                else:
+                    for d in range(w.lo, new_lo):
+                        if d in self.buckets:
+                            w.apply(self.buckets[d], sign=-1)
+                    for d in range(w.hi + 1, new_hi + 1):
+                        if d in self.buckets:
+                            w.apply(self.buckets[d])
+                w.lo, w.hi = new_lo, new_hi
+            self.today = today
+            # Buckets older than the largest window are never needed again.
+            cutoff = today - self.max_days + 1
+            for d in [d for d in self.buckets if d < cutoff]:
+                del self.buckets[d]
+
+    # --- Updates ---
+
+    def _apply_log(self, day, project_id, pillar_id, hours, focus, sign):
+        if self.today is None:
+            self.advance(day)
+        if day >= self.today - self.max_days + 1:
+            bucket = self.buckets.setdefault(day, _Bucket())
+            bucket.add(project_id, pillar_id, hours, focus, sign)
+            for w in self.windows.values():
+                if w.lo <= day <= w.hi:
+                    w.total.add(hours, focus, 1, sign)
+                    w.by_project[project_id].add(hours, focus, 1, sign)
+                    w.by_pillar[pillar_id].add(hours, focus, 1, sign)
+
+        was_deep = self.day_hours[day] >= self.streak_hours
+        self.day_hours[day] += sign * hours
+        is_deep = self.day_hours[day] >= self.streak_hours
+        if is_deep and not was_deep and self.streak_end is not None and day == self.streak_end + 1:
+            self.streak_end, self.streak_len = day, self.streak_len + 1
+        elif is_deep and not was_deep and (self.streak_end is None or day > self.streak_end + 1):
+            self.streak_end, self.streak_len = day, 1
+        elif is_deep != was_deep:
+            # A past day changed (backfill or delete); rare, so walk the streak again.
+            self._recompute_streak()
+        self.best_streak = max(self.best_streak, self.streak_len)
+
+    def _recompute_streak(self):
+        deep_days = sorted(d for d, h in self.day_hours.items() if h >= self.streak_hours)
+        self.streak_end, self.streak_len, self.best_streak = None, 0, 0
+        for d in deep_days:
+            if self.streak_end is not None and d == self.streak_end + 1:
+                self.streak_len += 1
+            else:
+                self.streak_len = 1
+            self.streak_end = d
+            self.best_streak = max(self.best_streak, self.streak_len)
+
+    def add_log(self, day_key, project_id, pillar_id, hours, focus_score):
+        with self._lock:
+            self._apply_log(day_ordinal(day_key), project_id, pillar_id or "Unknown", float(hours or 0), float(focus_score or 0), 1)
+
+    def remove_log(self, day_key, project_id, pillar_id, hours, focus_score):
+        with self._lock:
+            self._apply_log(day_ordinal(day_key), project_id, pillar_id or "Unknown", float(hours or 0), float(focus_score or 0), -1)
+
+    # --- Queries (all O(1)) ---
+
+    def _stats(self, days, project_id=None, pillar_id=None):
+        w = self.windows[days]
+        if project_id is not None:
+            return w.by_project.get(project_id, _Stats())
+        if pillar_id is not None:
+            return w.by_pillar.get(pillar_id, _Stats())
+        return w.total
+
+    def hours(self, days, project_id=None, pillar_id=None):
+        with self._lock:
+            return self._stats(days, project_id, pillar_id).hours
+
+    def avg_focus(self, days, project_id=None, pillar_id=None):
+        with self._lock:
+            s = self._stats(days, project_id, pillar_id)
+            return s.focus / s.count if s.count else None
+
+    def log_count(self, days, project_id=None, pillar_id=None):
+        with self._lock:
+            return self._stats(days, project_id, pillar_id).count
+
+    def current_streak(self):
+        """Consecutive deep-work days ending today (or yesterday, if today isn't done yet)."""
+        with self._lock:
+            if self.streak_end is None or self.today is None:
+                return 0
+            return self.streak_len if self.streak_end >= self.today - 1 else 0
+
+    def pillar_hours(self, days):
+        with self._lock:
+            return {p: s.hours for p, s in self.windows[days].by_pillar.items() if s.count}
+
+    def project_hours(self, days):
+        with self._lock:
+            return {p: s.hours for p, s in self.windows[days].by_project.items() if s.count}
+
+    # --- Bootstrap ---
+
+    @classmethod
+    def from_frame(cls, df_logs, today_key, **kwargs):
+        """Builds the engine from an existing logs frame with one groupby per day/project/pillar.
+
+        Compacted rows stand for `log_count` logs with a mean `focus_score`.
+        """
+        engine = cls(**kwargs)
+        engine.advance(day_ordinal(today_key))
+        if df_logs.empty:
+            return engine
+        df = df_logs[["day_key", "project_id", "pillar_id", "hours", "focus_score"]].copy()
+        df["pillar_id"] = df["pillar_id"].fillna("Unknown")
+        df["count"] = df_logs["log_count"].fillna(1) if "log_count" in df_logs.columns else 1
+        df["focus"] = pd.to_numeric(df["focus_score"], errors="coerce").fillna(0) * df["count"]
+        grouped = df.groupby(["day_key", "project_id", "pillar_id"]).agg(
+            hours=("hours", "sum"), focus=("focus", "sum"), count=("count", "sum")
+        ).reset_index()
+        with engine._lock:
+            for row in grouped.itertuples(index=False):
+                day = day_ordinal(row.day_key)
+                engine.day_hours[day] += float(row.hours)
+                if day < engine.today - engine.max_days + 1:
+                    continue
+                bucket = engine.buckets.setdefault(day, _Bucket())
+                bucket.total.add(row.hours, row.focus, row.count)
+                bucket.by_project[row.project_id].add(row.hours, row.focus, row.count)
+                bucket.by_pillar[row.pillar_id].add(row.hours, row.focus, row.count)
+                for w in engine.windows.values():
+                    if w.lo <= day <= w.hi:
+                        w.total.add(row.hours, row.focus, row.count)
+                        w.by_project[row.project_id].add(row.hours, row.focus, row.count)
+                        w.by_pillar[row.pillar_id].add(row.hours, row.focus, row.count)
+            engine._recompute_streak()
+        return engine
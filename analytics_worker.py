@@ -0,0 +1,264 @@
+"""Standalone analytics worker.
+
+Owns the data sync and the dashboard aggregations for every Streamlit process
+on the host: it watches meta/cache_versions, recomputes the aggregates when the
+data (or the day) changes, and publishes them as Arrow IPC buffers in shared
+memory. Streamlit processes copy the latest segment out once per version and
+decode its (small) tables into DataFrames instead of recomputing them.
+
+    python analytics_worker.py
+"""
+import argparse
+import json
+import os
+import signal
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+import pyarrow as pa
+from db_config import get_db
+from time_keys import current_keys
+from cache_sync import CacheSync
+from compaction import SUMMARY_COLLECTION
+from aggregates import Aggregates, load_frames, compute_aggregates
+
+DEFAULT_SEGMENT = "northstar_analytics"
+WATCHED_COLLECTIONS = ("work_logs", "projects", SUMMARY_COLLECTION)
+KEEP_SEGMENTS = 3               # Older snapshots stay mapped a little while for slow readers
+HEARTBEAT_SECONDS = 5
+STALE_AFTER_SECONDS = 60        # Readers ignore a worker that stopped heartbeating
+
+# Control block: seqlock counter, version, heartbeat (ms), data length, data segment name.
+_CONTROL = struct.Struct("<QQQQ64s")
+
+def get_segment_name():
+    return os.getenv("NORTHSTAR_ANALYTICS_SHM", DEFAULT_SEGMENT)
+
+def _attach(name):
+    """Opens an existing segment without handing it to this process's resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: attaching registers the segment, which would unlink it at exit.
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+def _to_ipc(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+# --- Publishing (worker side) ---
+
+class SharedAggregatesPublisher:
+    """Writes each Aggregates snapshot to a new versioned segment, then flips the control block."""
+    def __init__(self, name=None):
+        self.name = name or get_segment_name()
+        self.version = 0
+        self._segments = []
+        try:
+            self.control = shared_memory.SharedMemory(name=self.name, create=True, size=_CONTROL.size)
+        except FileExistsError:
+            # Left over from a worker that died: take it over.
+            self.control = _attach(self.name)
+            self.version = _CONTROL.unpack_from(self.control.buf)[1]
+        self._seq = _CONTROL.unpack_from(self.control.buf)[0] & ~1
+        self._data_name = b""
+        self._data_len = 0
+
+    def _write_control(self):
+        # Seqlock: odd while writing, so readers retry instead of seeing a torn update.
+        self._seq += 1
+        struct.pack_into("<Q", self.control.buf, 0, self._seq)
+        heartbeat = int(time.time() * 1000)
+        _CONTROL.pack_into(self.control.buf, 0, self._seq, self.version, heartbeat, self._data_len, self._data_name)
+        self._seq += 1
+        struct.pack_into("<Q", self.control.buf, 0, self._seq)
+
+    def publish(self, aggregates):
+        self.version += 1
+        blobs = {name: _to_ipc(df) for name, df in aggregates.tables.items()}
+        offsets, pos = {}, 0
+        for name, blob in blobs.items():
+            offsets[name] = [pos, blob.size]
+            pos += blob.size
+        header = json.dumps({"meta": {**aggregates.meta, "version": self.version}, "tables": offsets}).encode()
+        prefix = struct.pack("<I", len(header)) + header
+        # Arrow buffers start 64-byte aligned, as the IPC format expects.
+        body_start = -(-len(prefix) // 64) * 64
+
+        data_name = f"{self.name}_{self.version}"
+        try:
+            shm = shared_memory.SharedMemory(name=data_name, create=True, size=body_start + pos)
+        except FileExistsError:
+            # Orphaned by a worker that crashed mid-publish.
+            stale = _attach(data_name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=data_name, create=True, size=body_start + pos)
+        shm.buf[:len(prefix)] = prefix
+        for name, blob in blobs.items():
+            start = body_start + offsets[name][0]
+            shm.buf[start:start + blob.size] = blob.to_pybytes()
+
+        self._data_name, self._data_len = data_name.encode(), body_start + pos
+        self._write_control()
+        self._segments.append(shm)
+        while len(self._segments) > KEEP_SEGMENTS:
+            old = self._segments.pop(0)
+            old.close()
+            old.unlink()
+        return self.version
+
+    def heartbeat(self):
+        self._write_control()
+
+    def close(self):
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
+        self.control.close()
+        self.control.unlink()
+
+# --- Reading (Streamlit side) ---
+
+class SharedAggregatesReader:
+    """Reads the worker's latest snapshot. Each version is copied and decoded once, then reused."""
+    def __init__(self, name=None):
+        self.name = name or get_segment_name()
+        self._lock = threading.Lock()
+        self._control = None
+        self._current = None    # (version, Aggregates)
+
+    def _read_control(self):
+        for _ in range(100):
+            seq1 = struct.unpack_from("<Q", self._control.buf)[0]
+            if seq1 & 1:
+                time.sleep(0.0005)
+                continue
+            fields = _CONTROL.unpack_from(self._control.buf)
+            if struct.unpack_from("<Q", self._control.buf)[0] == seq1:
+                return fields
+        return None
+
+    def latest(self):
+        """The newest snapshot, or None if no live worker has published one."""
+        with self._lock:
+            try:
+                if self._control is None:
+                    self._control = _attach(self.name)
+                fields = self._read_control()
+            except (FileNotFoundError, ValueError, OSError):
+                self._control = None
+                return None
+            if fields is None:
+                return None
+            _, version, heartbeat, data_len, data_name = fields
+            if not version or time.time() - heartbeat / 1000 > STALE_AFTER_SECONDS:
+                return None
+            if self._current and self._current[0] == version:
+                return self._current[1]
+            try:
+                shm = _attach(data_name.rstrip(b"\0").decode())
+            except FileNotFoundError:
+                return self._current[1] if self._current else None
+
+            # One copy of the (kilobyte-sized) segment per version, so the mapping can be
+            # released right away; the tables are then converted out of that copy.
+            try:
+                buf = pa.py_buffer(bytes(shm.buf[:data_len]))
+            finally:
+                shm.close()
+            header_len = struct.unpack_from("<I", buf)[0]
+            header = json.loads(buf.slice(4, header_len).to_pybytes())
+            body_start = -(-(4 + header_len) // 64) * 64
+            tables = {}
+            for name, (offset, size) in header["tables"].items():
+                reader = pa.ipc.open_file(buf.slice(body_start + offset, size))
+                tables[name] = reader.read_all().to_pandas()
+            aggregates = Aggregates(tables, header["meta"])
+            self._current = (version, aggregates)
+            return aggregates
+
+# --- Worker loop ---
+
+class AnalyticsWorker:
+    def __init__(self, db, publisher, poll_seconds=None):
+        self.db = db
+        self.publisher = publisher
+        self.sync = CacheSync(db, poll_seconds)
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        for c in WATCHED_COLLECTIONS:
+            self.sync.register(c, self._dirty.set)
+        self.sync.start_listener()
+        self._day_key = None
+
+    def refresh(self):
+        """Recomputes from Firestore and publishes. Returns the published version."""
+        # Read the versions directly: the listener's first snapshot may not have landed yet,
+        # and publishing without versions would leave every reader computing locally.
+        self.sync.poll()
+        self._dirty.clear()
+        # Versions are taken before the read: a write landing mid-read re-marks us dirty.
+        versions = {c: self.sync.versions.get(c) for c in WATCHED_COLLECTIONS}
+        keys = current_keys()
+        df_logs, projects_data = load_frames(self.db)
+        aggregates = compute_aggregates(df_logs, projects_data, keys)
+        aggregates.meta["versions"] = versions
+        self._day_key = keys["day_key"]
+        return self.publisher.publish(aggregates)
+
+    def run_forever(self):
+        self.refresh()
+        last_beat = time.monotonic()
+        while not self._stop.is_set():
+            self.sync.check()
+            if self._dirty.is_set() or current_keys()["day_key"] != self._day_key:
+                self.refresh()
+            elif time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+                self.publisher.heartbeat()
+                last_beat = time.monotonic()
+            self._stop.wait(1.0)
+
+    def stop(self):
+        self._stop.set()
+
+def is_fresh_versions(snapshot_versions, known_versions):
+    """True if data loaded at `snapshot_versions` reflects every version this process knows of."""
+    return all((snapshot_versions.get(c) or 0) >= (known_versions.get(c) or 0) for c in WATCHED_COLLECTIONS)
+
+def is_fresh(aggregates, known_versions, day_key):
+    """True if a snapshot is for today and reflects every data version this process knows of."""
+    if aggregates.meta.get("day_key") != day_key:
+        return False
+    return is_fresh_versions(aggregates.meta.get("versions") or {}, known_versions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish dashboard aggregates to shared memory for Streamlit processes.")
+    parser.add_argument("--poll-seconds", type=float, help="Version poll interval when the Firestore listener is unavailable")
+    args = parser.parse_args(argv)
+
+    publisher = SharedAggregatesPublisher()
+    worker = AnalyticsWorker(get_db(), publisher, args.poll_seconds)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    print(f"Publishing analytics to shared memory '{publisher.name}'")
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.sync.close()
+        publisher.close()
+
+if __name__ == "__main__":
+    main()
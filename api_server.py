@@ -0,0 +1,298 @@
+"""Read-only JSON API over the shared aggregates, for the northstar-dashboard frontend.
+
+    python api_server.py --port 8502
+
+GET /api/health, /api/kpis, /api/projects, /api/rollups[/<name>], /api/logs.
+Responses carry an ETag (If-None-Match answers 304) and are gzipped when the
+client accepts it. Aggregate bodies are serialized once per data version.
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+from db_config import get_db, load_settings, get_settings as db_settings
+from time_keys import current_keys
+from cache_sync import CacheSync
+from aggregates import load_frames, compute_aggregates
+from analytics_worker import SharedAggregatesReader, is_fresh
+from export_logs import build_logs_query, get_dimension_map, to_export_row, MAX_IN_FILTER
+
+DEFAULT_SETTINGS = {
+    "host": "127.0.0.1",
+    "port": 8502,
+    "auth": "firebase",         # "firebase": require a Firebase ID token; "none": open (local dev only)
+    "allowed_origins": "*",     # Comma-separated CORS origins
+    "gzip_min_bytes": 1024,
+    "poll_seconds": 30.0,
+}
+LOGS_PAGE_SIZE = 50
+MAX_LOGS_PAGE_SIZE = 500
+ROLLUPS = ("project_hours", "daily_pillar", "quarter_projects")
+
+def get_settings():
+    """Defaults, then an optional [api] secrets section, then NORTHSTAR_API_<KEY> env vars."""
+    return load_settings(DEFAULT_SETTINGS, "api", "NORTHSTAR_API_")
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _records(df):
+    """JSON-safe records (NaN -> null)."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def _scalar(value):
+    """A plain JSON value (numpy scalars unwrapped, NaN -> null)."""
+    value = value.item() if hasattr(value, "item") else value
+    return None if isinstance(value, float) and pd.isna(value) else value
+
+def _encode(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+class Body:
+    """A serialized response: raw bytes, lazily gzipped bytes and its ETag."""
+    def __init__(self, raw):
+        self.raw = raw
+        self.etag = 'W/"' + hashlib.sha1(raw).hexdigest()[:20] + '"'
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.raw, compresslevel=6)
+        return self._gzipped
+
+class ApiCache:
+    """Warm, shared view for all API requests.
+
+    Prefers the analytics worker's shared-memory snapshot and falls back to
+    computing the aggregates here. Rendered bodies are kept per data version,
+    so repeat requests cost a dict lookup.
+    """
+    def __init__(self, db, poll_seconds=None):
+        self.db = db
+        self.sync = CacheSync(db, poll_seconds)
+        self.sync.start_listener()
+        self.reader = SharedAggregatesReader()
+        self._lock = threading.Lock()
+        self._local = None          # (key, Aggregates)
+        self._bodies = {}           # (key, endpoint) -> Body
+
+    def aggregates(self):
+        """Returns (cache key, Aggregates, source)."""
+        self.sync.check()
+        day_key = current_keys()["day_key"]
+        known = self.sync.versions
+        shared = self.reader.latest()
+        if shared is not None and is_fresh(shared, known, day_key):
+            return ("worker", shared.meta.get("version"), day_key), shared, "worker"
+        key = ("local", tuple(sorted(known.items())), day_key)
+        with self._lock:
+            if self._local is None or self._local[0] != key:
+                df_logs, projects_data = load_frames(self.db)
+                self._local = (key, compute_aggregates(df_logs, projects_data, current_keys()))
+                self._bodies = {}
+            return key, self._local[1], "local"
+
+    def body(self, endpoint, build):
+        key, agg, source = self.aggregates()
+        with self._lock:
+            cached = self._bodies.get((key, endpoint))
+            if cached is None:
+                # Drop bodies from older versions; only the current one is ever served.
+                self._bodies = {k: v for k, v in self._bodies.items() if k[0] == key}
+                cached = self._bodies[(key, endpoint)] = Body(_encode(build(agg, source)))
+            return cached
+
+# --- Endpoint payloads ---
+
+def health_payload(agg, source):
+    return {"ok": True, "source": source, "version": agg.meta.get("version"), "day_key": agg.meta.get("day_key")}
+
+def kpis_payload(agg, source):
+    kpis = {k: _scalar(v) for k, v in agg.kpis.items()}
+    return {"day_key": agg.meta.get("day_key"), "kpis": kpis}
+
+def projects_payload(agg, source):
+    hours = agg.project_hours()
+    projects = []
+    for pid, data in agg.projects_data().items():
+        spent = float(hours.get(pid, 0.0))
+        budget = data.get("budget") or 0
+        projects.append({
+            "id": pid,
+            **data,
+            "hours_spent": round(spent, 2),
+            "progress": round(spent / budget, 4) if budget else None,
+        })
+    return {"projects": projects}
+
+def rollups_payload(names):
+    def build(agg, source):
+        return {name: _records(agg.table(name)) for name in names}
+    return build
+
+def _parse_day(value, field):
+    try:
+        d = datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(400, f"'{field}' must be YYYY-MM-DD")
+    return datetime.datetime.combine(d, datetime.time.min).replace(tzinfo=datetime.timezone.utc)
+
+def logs_payload(db, params):
+    """One page of raw logs in date order, with the cursor for the next page (the last doc id)."""
+    try:
+        limit = min(int(params.get("limit", [LOGS_PAGE_SIZE])[0]), MAX_LOGS_PAGE_SIZE)
+    except ValueError:
+        raise ApiError(400, "'limit' must be an integer")
+    if limit < 1:
+        raise ApiError(400, "'limit' must be at least 1")
+    start = _parse_day(params["start"][0], "start") if "start" in params else None
+    end = _parse_day(params["end"][0], "end") + datetime.timedelta(days=1) if "end" in params else None
+    project_ids = params.get("project_id") or None
+    if project_ids and len(project_ids) > MAX_IN_FILTER:
+        # build_logs_query() would drop the filter; cursor pages can't be filtered client-side.
+        raise ApiError(400, f"At most {MAX_IN_FILTER} project_id values per request")
+
+    query = build_logs_query(db, start, end, project_ids)
+    if "cursor" in params:
+        cursor = db.collection("work_logs").document(params["cursor"][0]).get()
+        if not cursor.exists:
+            raise ApiError(400, "Unknown cursor")
+        query = query.start_after(cursor)
+    docs = list(query.limit(limit).stream())
+    dims = get_dimension_map()
+    return {
+        "logs": [to_export_row(doc.id, doc.to_dict(), dims) for doc in docs],
+        "next_cursor": docs[-1].id if len(docs) == limit else None,
+    }
+
+# --- HTTP ---
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "NorthStarAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _cors(self):
+        allowed = [o.strip() for o in self.server.settings["allowed_origins"].split(",") if o.strip()]
+        origin = self.headers.get("Origin")
+        if "*" in allowed:
+            self.send_header("Access-Control-Allow-Origin", "*")
+        elif origin in allowed:
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Vary", "Origin")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+
+    def _send(self, status, body):
+        not_modified = status == 200 and body.etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]
+        self.send_response(304 if not_modified else status)
+        self._cors()
+        self.send_header("Cache-Control", "private, no-cache")
+        self.send_header("ETag", body.etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if not_modified:
+            self.end_headers()
+            return
+        payload = body.raw
+        if len(payload) >= self.server.settings["gzip_min_bytes"] and "gzip" in self.headers.get("Accept-Encoding", ""):
+            payload = body.gzipped()
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorize(self):
+        if self.server.settings["auth"] == "none":
+            return
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            raise ApiError(401, "Missing bearer token")
+        from firebase_admin import auth
+        try:
+            auth.verify_id_token(header[len("Bearer "):])
+        except Exception:
+            raise ApiError(401, "Invalid or expired token")
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._cors()
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Authorization, If-None-Match")
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        cache = self.server.cache
+        try:
+            if parts[:1] != ["api"] or len(parts) < 2:
+                raise ApiError(404, "Not found")
+            self._authorize()
+            route = parts[1]
+            if route == "health":
+                body = cache.body("health", health_payload)
+            elif route == "kpis":
+                body = cache.body("kpis", kpis_payload)
+            elif route == "projects":
+                body = cache.body("projects", projects_payload)
+            elif route == "rollups":
+                names = ROLLUPS if len(parts) == 2 else tuple(parts[2:3])
+                if not set(names) <= set(ROLLUPS):
+                    raise ApiError(404, f"Unknown rollup; expected one of {', '.join(ROLLUPS)}")
+                body = cache.body("rollups/" + ",".join(names), rollups_payload(names))
+            elif route == "logs":
+                body = Body(_encode(logs_payload(cache.db, parse_qs(url.query))))
+            else:
+                raise ApiError(404, "Not found")
+        except ApiError as e:
+            return self._send(e.status, Body(_encode({"error": str(e)})))
+        except Exception as e:
+            return self._send(500, Body(_encode({"error": f"Internal error: {e}"})))
+        self._send(200, body)
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, settings, cache, verbose=False):
+        self.settings = settings
+        self.cache = cache
+        self.verbose = verbose
+        super().__init__((settings["host"], settings["port"]), ApiHandler)
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Serve projects, KPIs, rollups and logs as JSON for the dashboard frontend.")
+    parser.add_argument("--host", default=settings["host"])
+    parser.add_argument("--port", type=int, default=settings["port"])
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+    settings.update(host=args.host, port=args.port)
+    if settings["auth"] == "firebase" and db_settings()["emulator_host"]:
+        # The emulator client never initializes firebase_admin, so every token check would fail.
+        parser.error("auth = \"firebase\" needs the production Firebase app; set NORTHSTAR_API_AUTH=none when using the emulator")
+
+    cache = ApiCache(get_db(), settings["poll_seconds"])
+    server = ApiServer(settings, cache, args.verbose)
+    print(f"Serving on http://{args.host}:{args.port}/api (auth: {settings['auth']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cache.sync.close()
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,30 @@ import datetime
 import time
 import re
 import json
+import os
 import plotly.express as px
 import google.generativeai as genai
-from db_config import get_db
+from db_config import get_db, warm_up, ping, get_db_stats, call_options
+from export_logs import export_logs, new_export_path, get_dimension_map, EXPORT_FORMATS
+from time_keys import time_keys, current_keys, get_timezone
+from cache_sync import get_cache_sync, COHERENT_TTL
+from llm_gateway import get_llm_gateway, get_session_key, GatewayBusy
+from history_index import load_or_build
+from import_logs import import_file, write_logs, summarize, detect_format, imported_day_keys, STATUS_OK
+from compaction import compact_logs, compaction_cutoff, get_retention_days, SUMMARY_COLLECTION
+from aggregates import DataSnapshot, load_frames, compute_aggregates
+from analytics_worker import SharedAggregatesReader, is_fresh, is_fresh_versions
+from reports import build_report, report_figure, load_reports, invalidate_reports, is_closed, REPORTS_COLLECTION
+from strategy_audit import AUDIT_RULES, SINGLE_FORMAT, APPROVED, INVALID, parse_proposals, check_proposals, audit_batch, commit_projects
 from firebase_admin import firestore
 
 # --- Helper Functions ---
-@st.cache_data(ttl=600)
+@st.cache_data(ttl=COHERENT_TTL)
 def get_projects():
     """Fetches all projects from Firestore and returns a dict mapping Name -> ID."""
     db = get_db()
     projects_ref = db.collection("projects")
-    docs = projects_ref.stream()
+    docs = projects_ref.stream(**call_options())
     
     project_map = {}
     for doc in docs:
@@ -25,76 +37,110 @@ def get_projects():
             
     return project_map
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=COHERENT_TTL)
 def get_pillars():
     """Fetches all pillars from Firestore."""
     db = get_db()
-    pillars_ref = db.collection("pillars").stream()
+    pillars_ref = db.collection("pillars").stream(**call_options())
     pillars = []
     for doc in pillars_ref:
         d = doc.to_dict()
         pillars.append(d.get("name", doc.id))
     return pillars
 
-@st.cache_data(ttl=600)
+@st.cache_resource(ttl=COHERENT_TTL)
+def load_data_snapshot():
+    """One DataSnapshot of Logs and Projects per process, shared by every session."""
+    # Versions are taken before the read, so a write landing mid-read leaves the snapshot behind.
+    versions = get_cache_sync().versions
+    df_logs, projects_data = load_frames(get_db())
+    return DataSnapshot(df_logs, projects_data, versions)
+
 def get_all_data():
-    """Fetches Logs, Projects, and Pillars for the Dashboard."""
-    db = get_db()
-    
-    # 1. Fetch Projects
-    projects_ref = db.collection("projects").stream()
-    projects_data = {}
-    for doc in projects_ref:
-        d = doc.to_dict()
-        projects_data[doc.id] = {
-            "project_name": d.get("name"),
-            "pillar_id": d.get("pillar_id"),
-            "budget": d.get("total_hours_budget", 0),
-            "status": d.get("status", "Active"),
-            "quarter": d.get("quarter", "Top Priority"), # Default if missing
-            "visibility": d.get("visibility", True) # Default Visible
-        }
-        
-    # 2. Fetch Work Logs
-    logs_ref = db.collection("work_logs").order_by("date", direction=firestore.Query.DESCENDING).stream()
-    logs_list = []
-    for doc in logs_ref:
-        d = doc.to_dict()
-        if d.get("date"):
-            d["date"] = d["date"]
-        # Add doc ID for deletion
-        d["id"] = doc.id 
-        logs_list.append(d)
-        
-    df_logs = pd.DataFrame(logs_list)
-    
-    # 3. Merge Data
-    if not df_logs.empty and projects_data:
-        df_logs["pillar_id"] = df_logs["project_id"].map(lambda x: projects_data.get(x, {}).get("pillar_id", "Unknown"))
-    
-    return df_logs, projects_data
+    """The shared DataSnapshot, reloaded if it predates a data version this process knows of.
+
+    A clear() racing the load can't drop a stale result, so freshness is
+    checked on every access instead.
+    """
+    snapshot = load_data_snapshot()
+    if not is_fresh_versions(snapshot.versions, get_cache_sync().versions):
+        load_data_snapshot.clear()
+        snapshot = load_data_snapshot()
+    return snapshot
+
+@st.cache_resource(ttl=COHERENT_TTL)
+def get_quarter_reports():
+    """Stored reports of closed quarters: {quarter_key: (report, figure)}, charts decoded once per process."""
+    return {period: (report, report_figure(report)) for period, report in load_reports(get_db(), "quarter").items()}
+
+@st.cache_resource
+def get_aggregates_reader():
+    return SharedAggregatesReader()
+
+@st.cache_resource(ttl=COHERENT_TTL, max_entries=4)
+def compute_local_aggregates(day_key, versions):
+    """In-process fallback when no analytics worker is running. Keyed by the data versions, so writes invalidate it."""
+    data = get_all_data()
+    return compute_aggregates(data.logs, data.projects, current_keys())
+
+def get_aggregates():
+    """Dashboard aggregates: the host's analytics worker snapshot when it is live and current, else computed here."""
+    day_key = current_keys()["day_key"]
+    known = get_cache_sync().versions
+    shared = get_aggregates_reader().latest()
+    if shared is not None and is_fresh(shared, known, day_key):
+        return shared
+    return compute_local_aggregates(day_key, tuple(sorted(known.items())))
+
+@st.cache_resource
+def get_history_index():
+    """Retrieval index over per-project weekly summaries, loaded from disk or rebuilt if stale."""
+    return load_or_build(get_all_data().logs)
+
+def prepare_log_change():
+    """Fetches the history index *before* a log write; pass the result to record_log_change().
+
+    An index first built after the write would already include the log, so
+    only one that predates the write may be updated incrementally.
+    """
+    return get_history_index()
+
+def record_log_change(prepared, project_id, keys, hours, focus_score, removed=False):
+    """Applies a saved or deleted log to the history index (no history rescan).
+
+    `prepared` comes from prepare_log_change() before the write; `keys` carries the log's day_key and iso_week.
+    The dashboard figures follow from the version bump, via the worker or the local aggregates.
+    """
+    project = get_dimension_map().get(project_id, {})
+    pillar_id = project.get("pillar_id", "Unknown")
+    index = prepared
+    if removed:
+        index.remove_log(project_id, project.get("project_name"), pillar_id, keys["iso_week"], keys["day_key"], hours, focus_score)
+    else:
+        index.add_log(project_id, project.get("project_name"), pillar_id, keys["iso_week"], keys["day_key"], hours, focus_score)
+    index.save_later()
+    # Backdated changes make a closed period's stored report stale.
+    invalidate_reports(get_db(), [keys["day_key"]], sync=get_cache_sync())
 
 def get_todays_logs():
-    """Fetches work logs for the current date."""
+    """Fetches work logs for the current date (in the configured time zone)."""
     db = get_db()
-    today = datetime.datetime.now().date()
-    start_of_day = datetime.datetime.combine(today, datetime.time.min)
-    end_of_day = datetime.datetime.combine(today, datetime.time.max)
+    today_key = current_keys()["day_key"]
     
+    # Equality on day_key only needs the single-field index; sort locally.
     logs_ref = db.collection("work_logs")
     query = logs_ref.where(
-        field_path="date", op_string=">=", value=start_of_day
-    ).where(
-        field_path="date", op_string="<=", value=end_of_day
-    ).order_by(
-        "date", direction=firestore.Query.DESCENDING
+        field_path="day_key", op_string="==", value=today_key
     ).stream()
 
     logs_data = []
     for doc in query:
         logs_data.append(doc.to_dict())
         
-    return pd.DataFrame(logs_data)
+    df = pd.DataFrame(logs_data)
+    if not df.empty:
+        df = df.sort_values("date", ascending=False)
+    return df
 
 def get_active_session():
     """Checks for an active session in Firestore."""
@@ -126,6 +172,7 @@ def discard_session():
 def save_and_clear_session(project_id, project_name, hours, focus_score, log_date):
     """Transaction to save log and delete active session."""
     db = get_db()
+    prepared = prepare_log_change()
     batch = db.batch()
     
     # 1. Create Work Log
@@ -136,6 +183,7 @@ def save_and_clear_session(project_id, project_name, hours, focus_score, log_dat
          "hours": hours,
          "focus_score": focus_score,
          "date": log_date,
+         **time_keys(log_date),
          "created_at": firestore.SERVER_TIMESTAMP
     }
     batch.set(log_ref, log_entry)
@@ -144,13 +192,15 @@ def save_and_clear_session(project_id, project_name, hours, focus_score, log_dat
     session_ref = db.collection("active_sessions").document("current_session")
     batch.delete(session_ref)
     
+    # 3. Tell every replica the logs changed
+    get_cache_sync().bump("work_logs", batch=batch)
+    
     batch.commit()
+    record_log_change(prepared, project_id, log_entry, hours, focus_score)
 
 def get_current_quarter_str():
     """Returns 'Q1-2025', etc."""
-    today = datetime.date.today()
-    q = (today.month - 1) // 3 + 1
-    return f"Q{q}-{today.year}"
+    return current_keys()["quarter_key"]
 
 def render_donut_chart(value, total, color="green"):
     """Generates a simple SVG Donut Chart."""
@@ -196,32 +246,33 @@ def render_dashboard():
     st.title("Strategic Dashboard 📊")
     st.caption("Quarterly Focus: " + get_current_quarter_str())
     
-    df_logs, projects_data = get_all_data()
+    agg = get_aggregates()
+    kpis = agg.kpis
+    projects_data = agg.projects_data()
     
     # --- Top KPIs (Daily & Weekly) ---
-    now = datetime.datetime.now(datetime.timezone.utc)
-    today = datetime.date.today()
-    start_week = today - datetime.timedelta(days=today.weekday())
-    start_week_dt = datetime.datetime.combine(start_week, datetime.time.min).replace(tzinfo=datetime.timezone.utc)
-    
-    if not df_logs.empty:
-        df_logs['date'] = pd.to_datetime(df_logs['date'], utc=True)
+    if kpis["has_logs"]:
         # Weekly
-        mask_this_week = df_logs['date'] >= pd.Timestamp(start_week_dt)
-        df_this_week = df_logs[mask_this_week]
-        weekly_hours = df_this_week['hours'].sum()
+        weekly_hours = kpis["week_hours"]
         
         # Daily
-        mask_today = df_logs['date'].dt.date == today
-        df_today = df_logs[mask_today]
-        daily_hours = df_today['hours'].sum()
+        daily_hours = kpis["today_hours"]
         
         col1, col2, col3 = st.columns(3)
         col1.metric("Today's Output", f"{daily_hours:.1f}h", "Focus")
         col2.metric("Weekly Deep Work", f"{weekly_hours:.1f}h", "Target: 20h")
         
-        avg_focus = df_this_week['focus_score'].mean()
+        avg_focus = kpis["week_focus"]
         col3.metric("Avg Focus (Week)", f"{avg_focus:.1f}/5.0" if not pd.isna(avg_focus) else "N/A")
+        
+        # Rolling Trends
+        t7, t30, t90, t_focus, t_streak = st.columns(5)
+        t7.metric("Last 7 Days", f"{kpis['hours_7d']:.1f}h")
+        t30.metric("Last 30 Days", f"{kpis['hours_30d']:.1f}h", f"{kpis['hours_30d'] / 30 * 7:.1f}h/wk avg", delta_color="off")
+        t90.metric("Last 90 Days", f"{kpis['hours_90d']:.1f}h", f"{kpis['hours_90d'] / 90 * 7:.1f}h/wk avg", delta_color="off")
+        focus_30 = kpis["focus_30d"]
+        t_focus.metric("Avg Focus (30d)", f"{focus_30:.1f}/5.0" if not pd.isna(focus_30) else "N/A")
+        t_streak.metric("Deep Work Streak", f"{kpis['streak']} days", f"Best: {kpis['best_streak']}", delta_color="off")
     else:
         st.info("No logs yet.")
 
@@ -235,9 +286,8 @@ def render_dashboard():
     st.subheader("🚀 Active Projects")
     
     # Structure Data for Cards
-    project_stats = {}
-    if not df_logs.empty:
-        project_stats = df_logs.groupby("project_id")['hours'].sum().to_dict()
+    project_stats = agg.project_hours()
+    forecast = agg.burn()
     
     # Filter Logic
     curr_q = get_current_quarter_str()
@@ -293,6 +343,13 @@ def render_dashboard():
                         st.caption(f"{spent:.1f} / {budget} hrs")
                         if progress > 1.0:
                             st.error(f"+{(spent-budget):.1f}h")
+                        burn = forecast.get(pid)
+                        if burn and burn["burn_per_week"] > 0:
+                            st.caption(f"🔥 {burn['burn_per_week']:.1f}h/wk")
+                            if pd.notna(burn["overrun_date"]) and burn["quarter_slack"] < 0:
+                                st.warning(f"Over budget by {burn['overrun_date']}")
+                            elif pd.notna(burn["overrun_date"]):
+                                st.caption(f"Budget lasts until {burn['overrun_date']}")
                     with c_chart:
                         st.markdown(render_donut_chart(spent, budget, bar_color), unsafe_allow_html=True)
 
@@ -300,12 +357,9 @@ def render_dashboard():
     
     # --- Activity Trend ---
     st.subheader("📈 30-Day Activity")
-    last_30 = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=30)
-    df_chart = df_logs[df_logs['date'] >= last_30].copy() if not df_logs.empty else pd.DataFrame()
+    daily_data = agg.table("daily_pillar")
     
-    if not df_chart.empty:
-        df_chart['day'] = df_chart['date'].dt.date
-        daily_data = df_chart.groupby(['day', 'pillar_id'])['hours'].sum().reset_index()
+    if not daily_data.empty:
         fig = px.bar(daily_data, x='day', y='hours', color='pillar_id', title="Deep Work by Pillar", height=350)
         st.plotly_chart(fig, use_container_width=True)
     else:
@@ -313,36 +367,40 @@ def render_dashboard():
 
 def get_strategic_context():
     """Generates a context string for the AI Coach."""
-    df_logs, _ = get_all_data()
+    agg = get_aggregates()
+    kpis = agg.kpis
     active_session = get_active_session()
     
     # Current Week Stats
-    now = datetime.datetime.now(datetime.timezone.utc)
-    today = datetime.date.today()
-    start_week = today - datetime.timedelta(days=today.weekday())
-    start_week_dt = datetime.datetime.combine(start_week, datetime.time.min).replace(tzinfo=datetime.timezone.utc)
-    
-    weekly_hours = 0
-    debt_hours = 0
-    top_project = "None"
-    
-    if not df_logs.empty:
-        df_logs['date'] = pd.to_datetime(df_logs['date'], utc=True)
-        mask_this_week = df_logs['date'] >= pd.Timestamp(start_week_dt)
-        df_this_week = df_logs[mask_this_week]
-        
-        weekly_hours = df_this_week['hours'].sum()
-        debt_hours = df_logs[df_logs['pillar_id'].str.contains("Debt", case=False, na=False)]['hours'].sum()
-        if not df_this_week.empty:
-            top_project = df_this_week.groupby("project_name")['hours'].sum().idxmax()
+    weekly_hours = kpis["week_hours"]
+    debt_hours = kpis["debt_hours"]
+    top_project = kpis["top_project_week"]
             
     is_working = "Yes, on " + active_session['project_name'] if active_session else "No"
     
+    # Rolling Trends
+    focus_30 = kpis["focus_30d"]
+    focus_30_str = f"{focus_30:.1f}/5.0" if not pd.isna(focus_30) else "N/A"
+    pillar_mix = ", ".join(f"{r.pillar_id}: {r.hours:.1f}h" for r in agg.table("pillar_30d").itertuples()) or "None"
+
+    # Budget Forecast: open projects that run out this quarter, soonest first
+    burn = agg.table("burn").merge(agg.table("projects")[["project_id", "project_name", "status"]], on="project_id")
+    at_risk = burn[(burn["status"] != "Completed") & (burn["quarter_slack"] < 0)].sort_values("quarter_slack")
+    budget_risks = "; ".join(
+        f"{r.project_name} ({r.burn_per_week:.1f}h/wk, " + (f"out of budget {r.overrun_date}" if pd.notna(r.overrun_date) else f"{-r.remaining:.1f}h over") + ")"
+        for r in at_risk.head(5).itertuples()
+    ) or "None"
+    
     context = f"""
     - **Current Week Deep Work:** {weekly_hours:.1f} hours (Target: 20h).
     - **Total Debt Clearance:** {debt_hours:.1f} hours.
     - **Top Project This Week:** {top_project}.
     - **Currently Working?** {is_working}.
+    - **Rolling Deep Work:** 7d {kpis['hours_7d']:.1f}h, 30d {kpis['hours_30d']:.1f}h, 90d {kpis['hours_90d']:.1f}h.
+    - **Avg Focus (30d):** {focus_30_str}.
+    - **Pillar Mix (30d):** {pillar_mix}.
+    - **Deep Work Streak:** {kpis['streak']} days (Best: {kpis['best_streak']}).
+    - **Budgets Overrunning This Quarter:** {budget_risks}.
     """
     return context
 
@@ -396,11 +454,10 @@ def render_quarterly_dashboard():
     st.title("Quarterly Performance 📈")
     st.caption("Plan vs. Execution (2026)")
     
-    df_logs, _ = get_all_data()
-    if not df_logs.empty:
-         df_logs['date'] = pd.to_datetime(df_logs['date'], utc=True)
+    quarter_projects = get_aggregates().table("quarter_projects")
+    reports = get_quarter_reports()
          
-    now = datetime.datetime.now(datetime.timezone.utc)
+    curr_q = get_current_quarter_str()
     
     q1, q2, q3, q4 = st.tabs(["Q1: Cleanup", "Q2: Foundation", "Q3: Sales", "Q4: Scale"])
     
@@ -413,21 +470,23 @@ def render_quarterly_dashboard():
     
     for q_name, q_data in quarters.items():
         with q_data["tab"]:
-            start_dt = pd.Timestamp(q_data["start"]).replace(tzinfo=datetime.timezone.utc)
-            end_dt = pd.Timestamp(q_data["end"]).replace(tzinfo=datetime.timezone.utc)
+            quarter_key = f"{q_name}-2026"
             
-            if start_dt <= now <= end_dt:
+            if quarter_key == curr_q:
                 st.success("📍 **We Are Here**")
             
-            if not df_logs.empty:
-                mask = (df_logs['date'] >= start_dt) & (df_logs['date'] <= end_dt)
-                df_q = df_logs[mask]
+            # Closed quarters are served from their stored report (materialized by reports.py);
+            # the open quarter, or one without a report yet, is computed live.
+            if is_closed(quarter_key) and quarter_key in reports:
+                report, fig = reports[quarter_key]
             else:
-                df_q = pd.DataFrame()
+                df_q = quarter_projects[quarter_projects['quarter_key'] == quarter_key]
+                report = build_report(quarter_key, df_q, title=f"{q_name} Hours Distribution")
+                fig = report_figure(report)
                 
-            total_hours = df_q['hours'].sum() if not df_q.empty else 0
+            total_hours = report['total_hours']
             completion_rate = (total_hours / q_data['budget']) * 100
-            most_active = df_q.groupby("project_name")['hours'].sum().idxmax() if not df_q.empty else "N/A"
+            most_active = report['most_active']
             
             col_m1, col_m2, col_m3 = st.columns(3)
             col_m1.metric("Total Hours", f"{total_hours:.1f}", f"Target: {q_data['budget']}")
@@ -442,9 +501,8 @@ def render_quarterly_dashboard():
                 st.markdown(f"**Budget:** {q_data['budget']} Hours")
             with col_right:
                 st.subheader("The Execution (Reality)")
-                if not df_q.empty:
-                    fig = px.pie(df_q, values='hours', names='project_name', title=f"{q_name} Hours Distribution")
-                    st.plotly_chart(fig, use_container_width=True)
+                if fig is not None:
+                    st.plotly_chart(fig, use_container_width=True, key=f"report_{quarter_key}")
                 else:
                     st.warning("No data logged for this period yet.")
 
@@ -485,9 +543,16 @@ def render_ai_coach():
         with st.chat_message("assistant"):
             try:
                 context = get_strategic_context()
+                
+                # Only the few weekly summaries relevant to this question, to keep the prompt small
+                hits = get_history_index().search(prompt)
+                history_context = "\n".join(f"- {text}" for _, text in hits) or "- No matching history."
+                
                 system_instruction = f"""
                 You are an Elite Business Strategist for an AI Founder.
                 Current Context: {context}.
+                Relevant Work History (weekly summaries): 
+                {history_context}
                 Rules:
                 - Be direct and ruthless (CFO persona).
                 - This is the founders North Star: "To become the #1 AI for Finance Expert for Mid-sized companies".
@@ -497,20 +562,18 @@ def render_ai_coach():
                 - **LANGUAGE ADAPTABILITY:** Detect the language of the user's input. If the user speaks Arabic, reply in Arabic. If English, reply in English.
                 """
                 
-                model = genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_instruction)
-                
-                chat = model.start_chat(history=[
+                history = [
                     {"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]}
                     for m in st.session_state.messages[:-1]
-                ])
+                ]
                 
-                response = chat.send_message(prompt, stream=True)
+                # Queued, rate-limited and retried by the process-wide gateway
+                response = get_llm_gateway().chat_stream(get_session_key(), 'gemini-2.5-flash', history, prompt, system_instruction=system_instruction)
                 
                 placeholder = st.empty()
                 full_response_text = ""
                 
-                for chunk in response:
-                    text_chunk = chunk.text
+                for text_chunk in response:
                     full_response_text += text_chunk
                     
                     if is_arabic(full_response_text):
@@ -521,6 +584,8 @@ def render_ai_coach():
                 
                 st.session_state.messages.append({"role": "assistant", "content": full_response_text})
                 
+            except GatewayBusy as e:
+                st.warning(f"⏳ {e}")
             except Exception as e:
                 st.error(f"AI Error: {e}")
 
@@ -532,7 +597,7 @@ def render_settings_tab():
     
     # --- Section 1: Project Management (CRUD) ---
     with st.expander("📂 Manage Projects"):
-        tab_add, tab_edit = st.tabs(["Add New Project", "Edit Existing"])
+        tab_add, tab_batch, tab_edit = st.tabs(["Add New Project", "Batch Audit", "Edit Existing"])
         
         with tab_add:
             st.subheader("Add New Project")
@@ -567,25 +632,8 @@ def render_settings_tab():
                             # 1. Get Context
                             context_str = get_strategic_context()
                             
-                            # 2. Construct Prompt (Previous logic...)
-                            system_instruction = f"""
-                            You are a ruthless Investment Committee member for an AI Founder.
-                            Current Strategic Context: {context_str}
-                            
-                            Your Goal: Prevent Scope Creep.
-                            
-                            Rules for Approval:
-                            1. REJECT if 'The Cleanup (Debt)' hours are low but they want to add new features unrelated to debt.
-                            2. REJECT if the project is generic (e.g., 'Learn AI') instead of specific execution.
-                            3. REJECT if it violates the 'No New WIP' rule (unless it's critical debt fixing).
-                            4. APPROVE only if it directly contributes to: "AI for Finance Expert for Mid-sized companies" OR clearing Tech Debt.
-                            
-                            Output Format: JSON only.
-                            {{
-                                "status": "APPROVED" or "REJECTED",
-                                "reason": "Short, ruthless explanation."
-                            }}
-                            """
+                            # 2. Construct Prompt
+                            system_instruction = AUDIT_RULES.format(context=context_str) + SINGLE_FORMAT
                             
                             user_proposal = f"""
                             Propsoal:
@@ -596,8 +644,7 @@ def render_settings_tab():
                             """
                             
                             # 3. Call Gemini
-                            model = genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_instruction, generation_config={"response_mime_type": "application/json"})
-                            response = model.generate_content(user_proposal)
+                            response = get_llm_gateway().generate(get_session_key(), 'gemini-2.5-flash', user_proposal, system_instruction=system_instruction, generation_config={"response_mime_type": "application/json"})
                             result = json.loads(response.text)
                             
                             # 4. Save to State
@@ -612,6 +659,8 @@ def render_settings_tab():
                                 "created_at": firestore.SERVER_TIMESTAMP
                             }
                             
+                        except GatewayBusy as e:
+                            st.warning(f"⏳ {e}")
                         except Exception as e:
                             st.error(f"Audit Failed: {e}")
             
@@ -626,13 +675,14 @@ def render_settings_tab():
                         try:
                             payload = st.session_state['audit_payload']
                             db.collection("projects").add(payload)
+                            get_cache_sync().bump("projects")
                             st.success(f"Project '{payload['name']}' created!")
                             # Clear State
                             del st.session_state['audit_result']
                             if 'audit_payload' in st.session_state: del st.session_state['audit_payload']
                             
                             get_projects.clear() 
-                            get_all_data.clear()
+                            load_data_snapshot.clear()
                             time.sleep(1)
                             st.rerun()
                         except Exception as e:
@@ -646,6 +696,64 @@ def render_settings_tab():
                         del st.session_state['audit_result']
                         st.rerun()
                         
+        with tab_batch:
+            st.subheader("Batch Audit")
+            st.caption("Paste a table from a spreadsheet (or CSV) with columns: project, pillar, hours, quarter, justification. "
+                       "All proposals are judged against the same strategic context in one request.")
+            batch_text = st.text_area("Proposals", height=200, key="batch_proposals")
+
+            if st.button("🕵️ Audit All Proposals"):
+                try:
+                    proposals = parse_proposals(batch_text)
+                    if not proposals:
+                        st.error("Paste at least one proposal.")
+                    else:
+                        # 1. Local checks: only well-formed proposals go to the committee
+                        errors = check_proposals(proposals, get_pillars(), get_projects().keys())
+                        valid = [p for p, err in zip(proposals, errors) if err is None]
+                        with st.spinner(f"Consulting the Investment Committee on {len(valid)} proposals..."):
+                            verdicts = iter(audit_batch(get_llm_gateway(), get_session_key(), get_strategic_context(), valid)) if valid else iter(())
+                        # 2. Save to State
+                        st.session_state['batch_audit'] = [
+                            {**p, **({"status": INVALID, "reason": err} if err else next(verdicts))}
+                            for p, err in zip(proposals, errors)
+                        ]
+                except GatewayBusy as e:
+                    st.warning(f"⏳ {e}")
+                except Exception as e:
+                    st.error(f"Audit Failed: {e}")
+
+            if 'batch_audit' in st.session_state:
+                results = pd.DataFrame(st.session_state['batch_audit'])
+                results.insert(0, "add", results["status"] == APPROVED)
+                counts = results["status"].value_counts()
+                st.caption(" · ".join(f"{status}: {n}" for status, n in counts.items()))
+                edited = st.data_editor(
+                    results[["add", "status", "name", "pillar_id", "total_hours_budget", "quarter", "reason"]],
+                    column_config={"add": st.column_config.CheckboxColumn("Add", help="Only approved proposals can be added")},
+                    disabled=["status", "name", "pillar_id", "total_hours_budget", "quarter", "reason"],
+                    hide_index=True, use_container_width=True, key="batch_audit_editor",
+                )
+                selected = results[edited["add"] & (results["status"] == APPROVED)].to_dict("records")
+
+                col_add, col_reset = st.columns(2)
+                with col_add:
+                    if selected and st.button(f"🚀 Add {len(selected)} Approved Projects", type="primary"):
+                        try:
+                            written = commit_projects(db, selected, sync=get_cache_sync())
+                            del st.session_state['batch_audit']
+                            get_projects.clear()
+                            load_data_snapshot.clear()
+                            st.success(f"Created {written} projects.")
+                            time.sleep(1)
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Error: {e}")
+                with col_reset:
+                    if st.button("Clear Results"):
+                        del st.session_state['batch_audit']
+                        st.rerun()
+
         with tab_edit:
             st.subheader("Edit Project")
             project_map = get_projects()
@@ -680,8 +788,9 @@ def render_settings_tab():
                                 "quarter": updated_q,
                                 "visibility": updated_vis
                             })
+                            get_cache_sync().bump("projects")
                             st.success("Project updated!")
-                            get_all_data.clear()
+                            load_data_snapshot.clear()
                             time.sleep(1)
                             st.rerun()
                         
@@ -694,9 +803,10 @@ def render_settings_tab():
                     st.warning("Danger Zone")
                     if st.button("Delete Project 🗑️", key="del_proj"):
                          db.collection("projects").document(proj_id).delete()
+                         get_cache_sync().bump("projects")
                          st.success(f"Project deleted.")
                          get_projects.clear()
-                         get_all_data.clear()
+                         load_data_snapshot.clear()
                          time.sleep(1)
                          st.rerun()
             else:
@@ -733,18 +843,181 @@ def render_settings_tab():
                     st.write(f"Focus: {log.get('focus_score', '-')}")
                 with col4:
                     if st.button("Delete", key=f"del_{log['id']}"):
+                        prepared = prepare_log_change()
                         db.collection("work_logs").document(log['id']).delete()
+                        get_cache_sync().bump("work_logs")
                         st.success("Log deleted.")
-                        get_all_data.clear()
+                        if log.get('date'):
+                            record_log_change(prepared, log.get('project_id'), log if log.get('iso_week') else time_keys(log['date']), log.get('hours', 0), log.get('focus_score', 0), removed=True)
+                        load_data_snapshot.clear()
                         time.sleep(0.5)
                         st.rerun()
                 st.divider()
         else:
             st.info("No logs found.")
 
+    # --- Section 3: Database Health ---
+    with st.expander("🩺 Database Health"):
+        stats = get_db_stats()
+        col_m, col_i, col_p = st.columns(3)
+        col_m.metric("Mode", stats["mode"] or "N/A")
+        col_i.metric("Client Init", f"{stats['init_seconds'] * 1000:.0f} ms" if stats["init_seconds"] is not None else "N/A")
+        col_p.metric("Last Ping", f"{stats['last_ping_seconds'] * 1000:.0f} ms" if stats["last_ping_seconds"] is not None else "N/A")
+        st.caption(f"Pings OK: {stats['ping_ok']} · Errors: {stats['ping_errors']}")
+        if stats["last_error"]:
+            st.warning(f"Last error: {stats['last_error']}")
+        if st.button("Ping Database"):
+            try:
+                ping()
+                st.rerun()
+            except Exception as e:
+                st.error(f"Ping Failed: {e}")
+
+    # --- Section 4: AI Gateway ---
+    with st.expander("🤖 AI Gateway"):
+        m = get_llm_gateway().get_metrics()
+        col_q, col_f, col_l = st.columns(3)
+        col_q.metric("Queue Depth", m["queue_depth"], f"{m['in_flight']} in flight", delta_color="off")
+        col_f.metric("Completed", m["completed"], f"{m['retried']} retried", delta_color="off")
+        col_l.metric("Latency p95", f"{m['latency_p95']:.1f}s" if m["latency_p95"] is not None else "N/A")
+        wait_p95 = f"{m['wait_p95']:.2f}s" if m["wait_p95"] is not None else "N/A"
+        st.caption(f"Failed: {m['failed']} · Rejected: {m['rejected']} · Wait p95: {wait_p95}")
+
+    # --- Section 5: Export ---
+    with st.expander("📤 Export Logs"):
+        st.caption("Streams work logs page by page to a file, then offers it for download.")
+        col_f, col_d = st.columns(2)
+        with col_f:
+            export_fmt = st.selectbox("Format", list(EXPORT_FORMATS.keys()))
+            export_projects = st.multiselect("Projects (empty = all)", list(get_projects().keys()))
+        with col_d:
+            use_range = st.checkbox("Filter by date range", value=False)
+            date_range = st.date_input("Date range", value=(datetime.date.today() - datetime.timedelta(days=30), datetime.date.today()), disabled=not use_range)
+
+        if st.button("Prepare Export"):
+            start = end = None
+            if use_range and isinstance(date_range, tuple) and len(date_range) == 2:
+                start = datetime.datetime.combine(date_range[0], datetime.time.min).replace(tzinfo=datetime.timezone.utc)
+                end = datetime.datetime.combine(date_range[1] + datetime.timedelta(days=1), datetime.time.min).replace(tzinfo=datetime.timezone.utc)
+            project_map = get_projects()
+            project_ids = [project_map[p] for p in export_projects] or None
+
+            # A private file per export: concurrent sessions never share or overwrite each other's output.
+            extension = EXPORT_FORMATS[export_fmt]['extension']
+            out_path = new_export_path(extension)
+            bar = st.progress(0, text="Exporting...")
+
+            def on_progress(done, total):
+                if total:
+                    bar.progress(min(done / total, 1.0), text=f"Exported {done}/{total} logs")
+                else:
+                    bar.progress(0, text=f"Exported {done} logs")
+
+            try:
+                rows = export_logs(out_path, export_fmt, start, end, project_ids, on_progress=on_progress)
+                bar.empty()
+                previous = st.session_state.get('export_file')
+                if previous and os.path.exists(previous['path']):
+                    os.remove(previous['path'])
+                st.session_state['export_file'] = {"path": out_path, "name": f"work_logs_export.{extension}", "format": export_fmt, "rows": rows}
+            except Exception as e:
+                os.remove(out_path)
+                st.error(f"Export Failed: {e}")
+
+        if 'export_file' in st.session_state:
+            export_file = st.session_state['export_file']
+            if os.path.exists(export_file['path']):
+                st.success(f"{export_file['rows']} logs ready.")
+
+                def read_export(path=export_file['path']):
+                    with open(path, "rb") as f:
+                        return f.read()
+
+                # A callable is only read when the button is clicked, not on every rerun of this page.
+                st.download_button(
+                    "⬇️ Download",
+                    data=read_export,
+                    file_name=export_file['name'],
+                    mime=EXPORT_FORMATS[export_file['format']]['mime'],
+                )
+
+    # --- Section 6: Bulk Import ---
+    with st.expander("📥 Import Logs"):
+        st.caption("Backfill past time blocks from a CSV (project, date, hours, focus) or an iCalendar export (event title = project name).")
+        upload = st.file_uploader("CSV or .ics file", type=["csv", "ics", "ical"])
+
+        if upload is not None and st.button("Preview Import"):
+            try:
+                df_logs = get_all_data().logs
+                # Raw logs dedupe by content; compacted history only has day buckets left to check against.
+                raw = df_logs[~df_logs["compacted"]] if not df_logs.empty else df_logs
+                compacted = df_logs[df_logs["compacted"]] if not df_logs.empty else None
+                preview = import_file(upload.getvalue(), upload.name, get_projects(), raw, compacted=compacted)
+                st.session_state['import_preview'] = {"name": upload.name, "preview": preview}
+            except Exception as e:
+                st.error(f"Could not read file: {e}")
+
+        pending = st.session_state.get('import_preview')
+        if pending and upload is not None and pending['name'] == upload.name:
+            preview = pending['preview']
+            counts = summarize(preview)
+            ready = counts.get(STATUS_OK, 0)
+            col_r, col_s = st.columns(2)
+            col_r.metric("Ready to Import", ready)
+            col_s.metric("Skipped", len(preview) - ready)
+            st.caption(" · ".join(f"{status}: {n}" for status, n in counts.items() if status != STATUS_OK))
+            st.dataframe(preview, use_container_width=True, hide_index=True)
+
+            if ready and st.button(f"Import {ready} Logs", type="primary"):
+                bar = st.progress(0, text="Importing...")
+                try:
+                    written = write_logs(db, preview, source=f"import:{detect_format(upload.name)}",
+                                         on_progress=lambda done, total: bar.progress(done / total, text=f"Imported {done}/{total} logs"))
+                    get_cache_sync().bump("work_logs")
+                    invalidate_reports(db, imported_day_keys(preview), sync=get_cache_sync())
+                    # Bulk change: rebuild the index from the fresh logs rather than patching it.
+                    load_data_snapshot.clear()
+                    get_history_index.clear()
+                    del st.session_state['import_preview']
+                    st.success(f"Imported {written} logs.")
+                except Exception as e:
+                    st.error(f"Import Failed: {e}")
+
+    # --- Section 7: Retention ---
+    with st.expander("🗄️ Retention & Compaction"):
+        cutoff = compaction_cutoff()
+        st.caption(f"Logs dated before {cutoff:%Y-%m-%d} (older than {get_retention_days()} days, whole months, never the open quarter) "
+                   "roll into monthly per-project summaries; the raw docs move to the archive collection.")
+        col_dry, col_run = st.columns(2)
+        with col_dry:
+            if st.button("Dry Run"):
+                logs, summaries = compact_logs(cutoff, dry_run=True)
+                st.info(f"Would compact {logs} logs into {summaries} monthly summaries.")
+        with col_run:
+            if st.button("Compact Now", type="primary"):
+                try:
+                    with st.spinner("Compacting..."):
+                        logs, summaries = compact_logs(cutoff)
+                    if logs:
+                        load_data_snapshot.clear()
+                        get_history_index.clear()
+                    st.success(f"Compacted {logs} logs into {summaries} monthly summaries.")
+                except Exception as e:
+                    st.error(f"Compaction Failed: {e}")
+
 
 # --- UI Layout ---
 st.set_page_config(page_title="Deep Work Logger", page_icon="🚀", layout="wide")
+warm_up()
+
+# Cross-replica cache coherence: writes bump meta/cache_versions, every process clears precisely.
+cache_sync = get_cache_sync()
+cache_sync.register("projects", get_projects.clear, load_data_snapshot.clear, get_dimension_map.clear, remote_only=(get_history_index.clear,))
+cache_sync.register("pillars", get_pillars.clear)
+cache_sync.register(REPORTS_COLLECTION, get_quarter_reports.clear)
+cache_sync.register("work_logs", load_data_snapshot.clear, remote_only=(get_history_index.clear,))
+cache_sync.register(SUMMARY_COLLECTION, load_data_snapshot.clear, remote_only=(get_history_index.clear,))
+cache_sync.check()
 
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Home", "Log Work", "Strategy Map", "Quarterly Perf.", "AI Coach", "Settings"])
@@ -821,13 +1094,18 @@ elif page == "Log Work":
                     selected_project_name = st.selectbox("Select Project", options=list(project_map.keys()))
                     duration = st.number_input("Duration (Hours)", min_value=0.1, max_value=24.0, step=0.1, value=1.0)
                     focus_score = st.slider("Focus Score", min_value=1, max_value=5, value=3)
-                    date_input = st.date_input("Date", value=datetime.date.today())
+                    tz = get_timezone()
+                    date_input = st.date_input("Date", value=datetime.datetime.now(tz).date())
                     submit_button = st.form_submit_button("Commit to Database")
                     if submit_button:
                         try:
                             project_id = project_map[selected_project_name]
-                            log_date = datetime.datetime.combine(date_input, datetime.datetime.now().time()).replace(tzinfo=datetime.timezone.utc)
-                            db.collection("work_logs").add({"project_id": project_id, "project_name": selected_project_name, "hours": duration, "focus_score": focus_score, "date": log_date, "created_at": firestore.SERVER_TIMESTAMP})
+                            # The picked day at the current wall time, both in the reporting time zone, so day_key is the picked day.
+                            log_date = datetime.datetime.combine(date_input, datetime.datetime.now(tz).time(), tzinfo=tz).astimezone(datetime.timezone.utc)
+                            prepared = prepare_log_change()
+                            db.collection("work_logs").add({"project_id": project_id, "project_name": selected_project_name, "hours": duration, "focus_score": focus_score, "date": log_date, **time_keys(log_date), "created_at": firestore.SERVER_TIMESTAMP})
+                            get_cache_sync().bump("work_logs")
+                            record_log_change(prepared, project_id, time_keys(log_date), duration, focus_score)
                             st.success(f"Logged {duration} hours for '{selected_project_name}'!")
                             st.balloons()
                             time.sleep(1)
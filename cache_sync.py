@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+import streamlit as st
+from db_config import get_db
+from firebase_admin import firestore
+
+META_COLLECTION = "meta"
+VERSIONS_DOC = "cache_versions"
+COHERENT_TTL = 6 * 3600  # Safety-net TTL for caches kept fresh by version bumps
+DEFAULT_POLL_SECONDS = 30
+BUMP_BATCH_SIZE = 499     # Firestore batch write limit, less the version bump riding in the last batch
+
+def _versions_ref(db):
+    return db.collection(META_COLLECTION).document(VERSIONS_DOC)
+
+def bump_versions(db, *collections, batch=None):
+    """Marks collections as changed so every replica drops its cached copies.
+
+    Pass `batch` to make the bump part of an existing write batch.
+    """
+    update = {name: firestore.Increment(1) for name in collections}
+    if batch is not None:
+        batch.set(_versions_ref(db), update, merge=True)
+    else:
+        _versions_ref(db).set(update, merge=True)
+
+class CacheSync:
+    """Per-process view of the change versions in meta/cache_versions.
+
+    A Firestore listener pushes changes as they happen; if the listener can't
+    be started (or dies), check() falls back to a rate-limited single-document
+    poll. When a collection's version moves, its registered cache clears run.
+    """
+    def __init__(self, db, poll_seconds=None):
+        self.db = db
+        self.poll_seconds = poll_seconds if poll_seconds is not None else float(os.getenv("NORTHSTAR_CACHE_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+        self._lock = threading.Lock()
+        self._invalidators = {}     # collection -> [callable]
+        self._remote_only = {}      # collection -> [callable], skipped for this process's own writes
+        self._local_writes = {}     # collection -> bumps made by this process not yet seen
+        self._versions = None       # last seen versions (None until the first snapshot)
+        self._last_poll = 0.0
+        self._watch = None
+        self.invalidations = 0
+
+    def register(self, collection, *clears, remote_only=()):
+        """Sets the cache clears to run when `collection` changes (replaces earlier registrations).
+
+        `remote_only` clears are skipped when the change came from this process,
+        for caches the writer already updated in place.
+        """
+        with self._lock:
+            self._invalidators[collection] = list(clears)
+            self._remote_only[collection] = list(remote_only)
+
+    def bump(self, *collections, batch=None):
+        """bump_versions() for writes made by this process."""
+        with self._lock:
+            for c in collections:
+                self._local_writes[c] = self._local_writes.get(c, 0) + 1
+        bump_versions(self.db, *collections, batch=batch)
+
+    @property
+    def versions(self):
+        """Latest versions this process knows of, counting its own writes not yet seen back."""
+        with self._lock:
+            known = dict(self._versions or {})
+            for c, n in self._local_writes.items():
+                known[c] = (known.get(c) or 0) + n
+            return known
+
+    def start_listener(self):
+        try:
+            self._watch = _versions_ref(self.db).on_snapshot(self._on_snapshot)
+        except Exception:
+            self._watch = None
+        return self._watch is not None
+
+    def _listener_alive(self):
+        return self._watch is not None and getattr(self._watch, "is_active", True)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        data = docs[0].to_dict() if docs and docs[0].exists else {}
+        self._apply(data or {})
+
+    def _apply(self, versions):
+        with self._lock:
+            previous = self._versions
+            self._versions = dict(versions)
+            if previous is None:
+                # First look: this is the baseline, caches were just built.
+                return []
+            changed = [c for c in set(previous) | set(versions) if previous.get(c) != versions.get(c)]
+            clears = []
+            for c in changed:
+                clears.extend(self._invalidators.get(c, []))
+                delta = (versions.get(c) or 0) - (previous.get(c) or 0)
+                local = self._local_writes.get(c, 0)
+                if delta > local:
+                    clears.extend(self._remote_only.get(c, []))
+                self._local_writes[c] = max(local - delta, 0)
+        for fn in clears:
+            fn()
+        if changed:
+            self.invalidations += 1
+        return changed
+
+    def check(self):
+        """Cheap per-rerun hook: polls the versions document unless the listener is live."""
+        if self._listener_alive():
+            return []
+        if self._versions is not None and time.monotonic() - self._last_poll < self.poll_seconds:
+            return []
+        return self.poll()
+
+    def poll(self):
+        """Reads the versions document now, even with a live listener. Returns the changed collections."""
+        self._last_poll = time.monotonic()
+        doc = _versions_ref(self.db).get()
+        return self._apply(doc.to_dict() if doc.exists else {})
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+@st.cache_resource
+def get_cache_sync():
+    """One CacheSync per process, listening on meta/cache_versions when possible."""
+    sync = CacheSync(get_db())
+    sync.start_listener()
+    return sync
@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import pandas as pd
+import streamlit as st
+from db_config import get_db
+from time_keys import get_timezone, time_keys, add_time_keys
+from firebase_admin import firestore
+
+SUMMARY_COLLECTION = "work_log_summaries"
+ARCHIVE_COLLECTION = "work_logs_archive"
+DEFAULT_RETENTION_DAYS = 365
+# Each archived log costs a delete plus an archive write, and may touch its own summary doc.
+CHUNK_SIZE = 500 // 3
+
+def get_retention_days():
+    """Raw-log horizon: NORTHSTAR_RETENTION_DAYS env var, then `retention_days` in secrets."""
+    value = os.getenv("NORTHSTAR_RETENTION_DAYS")
+    if not value:
+        try:
+            value = st.secrets.get("retention_days")
+        except Exception:
+            value = None
+    return int(value or DEFAULT_RETENTION_DAYS)
+
+def compaction_cutoff(retention_days=None, now=None, tz=None):
+    """Start of the oldest month that stays raw, as a UTC datetime.
+
+    Only whole months are compacted, and never the open quarter.
+    """
+    tz = tz or get_timezone()
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(tz)
+    horizon = now - datetime.timedelta(days=retention_days if retention_days is not None else get_retention_days())
+    month_start = horizon.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    quarter_start = now.replace(month=(now.month - 1) // 3 * 3 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    cutoff = min(month_start, quarter_start)
+    return cutoff.astimezone(datetime.timezone.utc)
+
+def summary_id(project_id, month_key):
+    return f"{project_id}_{month_key}"
+
+def summarize_logs(logs, tz=None):
+    """Folds (doc_id, data) logs into {summary_id: increments} for a merge-set.
+
+    Totals are kept per month, with a per-day breakdown so streaks, weekly and
+    quarterly views still work after the raw logs are gone.
+    """
+    tz = tz or get_timezone()
+    summaries = {}
+    for _, d in logs:
+        keys = d if d.get("day_key") else time_keys(d["date"], tz)
+        day_key = keys["day_key"]
+        month_key = day_key[:7]
+        hours = float(d.get("hours") or 0)
+        focus = float(d.get("focus_score") or 0)
+        s = summaries.setdefault(summary_id(d.get("project_id"), month_key), {
+            "project_id": d.get("project_id"),
+            "project_name": d.get("project_name"),
+            "month_key": month_key,
+            "quarter_key": f"Q{(int(month_key[5:]) - 1) // 3 + 1}-{month_key[:4]}",
+            "hours": 0.0, "focus_sum": 0.0, "count": 0, "days": {},
+        })
+        s["hours"] += hours
+        s["focus_sum"] += focus
+        s["count"] += 1
+        day = s["days"].setdefault(day_key, {"hours": 0.0, "focus_sum": 0.0, "count": 0})
+        day["hours"] += hours
+        day["focus_sum"] += focus
+        day["count"] += 1
+    return summaries
+
+def _increments(s):
+    inc = firestore.Increment
+    return {
+        "project_id": s["project_id"],
+        "project_name": s["project_name"],
+        "month_key": s["month_key"],
+        "quarter_key": s["quarter_key"],
+        "hours": inc(s["hours"]),
+        "focus_sum": inc(s["focus_sum"]),
+        "count": inc(s["count"]),
+        "days": {k: {f: inc(v) for f, v in day.items()} for k, day in s["days"].items()},
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+
+def compact_logs(cutoff=None, dry_run=False, archive_path=None, chunk_size=CHUNK_SIZE, on_progress=None):
+    """Rolls work_logs dated before `cutoff` into monthly summaries and archives the raw docs.
+
+    Each chunk's summary increments, archive copies and deletes commit in one
+    batch, so an interrupted run never double counts or loses a log. With
+    `archive_path` the raw logs go to a JSONL file instead of the cold
+    collection. Returns (logs_compacted, summary_docs_touched).
+    """
+    from export_logs import build_logs_query, iter_log_pages, get_dimension_map, to_export_row
+    from cache_sync import bump_versions
+
+    db = get_db()
+    tz = get_timezone()
+    cutoff = cutoff or compaction_cutoff(tz=tz)
+    query = build_logs_query(db, end=cutoff)
+    compacted = 0
+    touched = set()
+
+    if dry_run:
+        for page, _ in iter_log_pages(query, chunk_size):
+            compacted += len(page)
+            touched.update(summarize_logs(page, tz))
+            if on_progress:
+                on_progress(compacted, len(touched))
+        return compacted, len(touched)
+
+    # Appended, never truncated: every run adds to the same cold file.
+    archive = open(archive_path, "a", encoding="utf-8") if archive_path else None
+    dims = get_dimension_map() if archive else None
+    try:
+        while True:
+            # Compacted logs are deleted, so the first page is always the next one.
+            logs = [(doc.id, doc.to_dict()) for doc in query.limit(chunk_size).stream()]
+            if not logs:
+                break
+
+            summaries = summarize_logs(logs, tz)
+            if archive:
+                # On disk before the raw docs are deleted.
+                archive.writelines(json.dumps(to_export_row(doc_id, d, dims), ensure_ascii=False) + "\n" for doc_id, d in logs)
+                archive.flush()
+                os.fsync(archive.fileno())
+            batch = db.batch()
+            for sid, s in summaries.items():
+                batch.set(db.collection(SUMMARY_COLLECTION).document(sid), _increments(s), merge=True)
+            for doc_id, d in logs:
+                if not archive:
+                    batch.set(db.collection(ARCHIVE_COLLECTION).document(doc_id), {**d, "archived_at": firestore.SERVER_TIMESTAMP})
+                batch.delete(db.collection("work_logs").document(doc_id))
+            batch.commit()
+
+            compacted += len(logs)
+            touched.update(summaries)
+            if on_progress:
+                on_progress(compacted, len(touched))
+            if len(logs) < chunk_size:
+                break
+    finally:
+        if archive:
+            archive.close()
+
+    if compacted:
+        bump_versions(db, "work_logs", SUMMARY_COLLECTION)
+    return compacted, len(touched)
+
+def summaries_to_frame(docs, tz=None):
+    """Expands summary docs into one row per project per day, shaped like the logs frame.
+
+    `focus_score` is the day's mean and `log_count` the number of logs it stands for.
+    """
+    tz = tz or get_timezone()
+    rows = []
+    for d in docs:
+        for day_key, day in (d.get("days") or {}).items():
+            count = int(day.get("count") or 0)
+            if count <= 0:
+                continue
+            rows.append({
+                "project_id": d.get("project_id"),
+                "project_name": d.get("project_name"),
+                "hours": float(day.get("hours") or 0),
+                "focus_score": float(day.get("focus_sum") or 0) / count,
+                "log_count": count,
+                "day_key": day_key,
+            })
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df["date"] = pd.to_datetime(df["day_key"]).dt.tz_localize(tz, ambiguous=False, nonexistent="shift_forward").dt.tz_convert("UTC")
+    df["compacted"] = True
+    return add_time_keys(df, tz)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roll old work_logs into monthly summaries and archive the raw docs.")
+    parser.add_argument("--retention-days", type=int, help=f"Keep raw logs this many days (default {DEFAULT_RETENTION_DAYS})")
+    parser.add_argument("--archive-file", help="Write archived logs to this JSONL file instead of the cold collection")
+    parser.add_argument("--dry-run", action="store_true", help="Count what would be compacted without writing")
+    args = parser.parse_args(argv)
+
+    cutoff = compaction_cutoff(args.retention_days)
+
+    def report(logs, summaries):
+        print(f"\rCompacted {logs} logs into {summaries} monthly summaries", end="", file=sys.stderr, flush=True)
+
+    logs, summaries = compact_logs(cutoff, dry_run=args.dry_run, archive_path=args.archive_file, on_progress=report)
+    verb = "Would compact" if args.dry_run else "Compacted"
+    print(f"\n{verb} {logs} logs dated before {cutoff:%Y-%m-%d} into {summaries} summaries.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
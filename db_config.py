@@ -1,16 +1,210 @@
+import os
+import time
+import threading
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as gexc
+from google.api_core import retry as gretry
+from google.cloud import firestore as gcf
+
+# Defaults can be overridden by a [firestore] section in secrets.toml
+# or by environment variables (NORTHSTAR_<KEY> in upper case).
+DEFAULT_SETTINGS = {
+    "emulator_host": None,          # Same as FIRESTORE_EMULATOR_HOST
+    "project_id": None,             # Required for the emulator if not in secrets
+    "keepalive_time_ms": 30000,
+    "keepalive_timeout_ms": 10000,
+    "timeout": 30.0,                # Per-call deadline (seconds)
+    "retry_initial": 0.2,
+    "retry_maximum": 10.0,
+    "retry_multiplier": 2.0,
+    "retry_deadline": 60.0,
+    "warm_up": True,
+}
+
+RETRYABLE_ERRORS = (
+    gexc.ServiceUnavailable,
+    gexc.DeadlineExceeded,
+    gexc.InternalServerError,
+    gexc.Aborted,
+    gexc.ResourceExhausted,
+)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "mode": None,              # "emulator" or "production"
+    "init_seconds": None,
+    "warm_up_seconds": None,
+    "last_ping_seconds": None,
+    "last_ping_at": None,
+    "ping_ok": 0,
+    "ping_errors": 0,
+    "last_error": None,
+}
+
+def _secrets_section(name):
+    """Returns a secrets section as a dict, or {} if secrets are unavailable (e.g. offline)."""
+    try:
+        if name in st.secrets:
+            return dict(st.secrets[name])
+    except Exception:
+        pass
+    return {}
+
+def load_settings(defaults, section, env_prefix):
+    """Defaults, then the [section] secrets section, then <env_prefix><KEY> env vars.
+
+    Env values are converted to the type of the default (bools accept 1/true/yes).
+    """
+    settings = dict(defaults)
+    settings.update(_secrets_section(section))
+    for key, default in defaults.items():
+        env_val = os.getenv(f"{env_prefix}{key.upper()}")
+        if env_val is None:
+            continue
+        if isinstance(default, bool):
+            settings[key] = env_val.lower() in ("1", "true", "yes")
+        elif isinstance(default, (int, float)):
+            settings[key] = type(default)(env_val)
+        else:
+            settings[key] = env_val
+    return settings
+
+def get_settings():
+    """Merges defaults, the [firestore] secrets section and environment overrides."""
+    settings = load_settings(DEFAULT_SETTINGS, "firestore", "NORTHSTAR_")
+    # The SDK reads FIRESTORE_EMULATOR_HOST itself, so keep both in sync.
+    settings["emulator_host"] = os.getenv("FIRESTORE_EMULATOR_HOST") or settings["emulator_host"]
+    return settings
+
+def get_retry(settings=None):
+    """Retry policy for Firestore calls: exponential backoff on transient gRPC errors."""
+    settings = settings or get_settings()
+    return gretry.Retry(
+        initial=settings["retry_initial"],
+        maximum=settings["retry_maximum"],
+        multiplier=settings["retry_multiplier"],
+        timeout=settings["retry_deadline"],
+        predicate=gretry.if_exception_type(*RETRYABLE_ERRORS),
+    )
+
+def call_options():
+    """Keyword arguments (retry, timeout) to pass to Firestore get()/stream() calls."""
+    settings = get_settings()
+    return {"retry": get_retry(settings), "timeout": settings["timeout"]}
+
+def _tune_channel(client, settings):
+    """Replaces the SDK's default gRPC channel with one using our keepalive options.
+
+    The SDK only hard-codes keepalive_time_ms, so the GAPIC client is built
+    here up front instead of lazily on the first request.
+    """
+    from google.cloud.firestore_v1.services.firestore import client as firestore_client
+    from google.cloud.firestore_v1.services.firestore.transports import grpc as firestore_grpc
+
+    transport_cls = firestore_grpc.FirestoreGrpcTransport
+    channel = transport_cls.create_channel(
+        client._target,
+        credentials=client._credentials,
+        options=[
+            ("grpc.keepalive_time_ms", int(settings["keepalive_time_ms"])),
+            ("grpc.keepalive_timeout_ms", int(settings["keepalive_timeout_ms"])),
+            ("grpc.keepalive_permit_without_calls", 1),
+        ],
+    )
+    transport = transport_cls(host=client._target, channel=channel)
+    client._transport = transport
+    client._firestore_api_internal = firestore_client.FirestoreClient(
+        transport=transport, client_options=client._client_options
+    )
+    firestore_client._client_info = client._client_info
+
+def create_client(settings=None):
+    """Builds a Firestore client for the emulator or for production."""
+    settings = settings or get_settings()
+    t0 = time.perf_counter()
+
+    if settings["emulator_host"]:
+        # Offline / local: no service account needed.
+        os.environ["FIRESTORE_EMULATOR_HOST"] = settings["emulator_host"]
+        project = settings["project_id"] or _secrets_section("firebase").get("project_id") or "demo-northstar"
+        db = gcf.Client(project=project)
+        mode = "emulator"
+    else:
+        if not firebase_admin._apps:
+            # Load credentials from Streamlit secrets
+            # Expects st.secrets["firebase"] to look like the service account JSON
+            key_dict = dict(st.secrets["firebase"])
+
+            cred = credentials.Certificate(key_dict)
+            firebase_admin.initialize_app(cred)
+
+        db = firestore.client()
+        _tune_channel(db, settings)
+        mode = "production"
+
+    with _stats_lock:
+        _stats["mode"] = mode
+        _stats["init_seconds"] = time.perf_counter() - t0
+    return db
+
+def ping(db=None):
+    """Cheap health check: a single-document read. Returns latency in seconds."""
+    db = db or get_db()
+    t0 = time.perf_counter()
+    try:
+        db.collection("meta").document("health").get(**call_options())
+    except Exception as e:
+        with _stats_lock:
+            _stats["ping_errors"] += 1
+            _stats["last_error"] = str(e)
+        raise
+    latency = time.perf_counter() - t0
+    with _stats_lock:
+        _stats["ping_ok"] += 1
+        _stats["last_ping_seconds"] = latency
+        _stats["last_ping_at"] = time.time()
+    return latency
 
 @st.cache_resource
 def get_db():
-    if not firebase_admin._apps:
-        # Load credentials from Streamlit secrets
-        # Expects st.secrets["firebase"] to look like the service account JSON
-        key_dict = dict(st.secrets["firebase"])
-        
-        cred = credentials.Certificate(key_dict)
-        firebase_admin.initialize_app(cred)
-        
-    db = firestore.client()
+    db = create_client()
     return db
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+def _warm_up():
+    settings = get_settings()
+    try:
+        db = get_db()
+        if settings["warm_up"]:
+            latency = ping(db)
+            with _stats_lock:
+                _stats["warm_up_seconds"] = latency
+    except Exception:
+        # Health is reported via get_db_stats(); the app can still render.
+        pass
+
+def warm_up():
+    """Initializes the client and opens the channel on a background thread, once per process.
+
+    Returns right away, so the script run that calls it isn't held up by the
+    connection setup; anything that needs the client first just waits on get_db().
+    Streamlit has no hook before the first session, so that run is where it starts.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_warm_up, name="firestore-warm-up", daemon=True)
+            # Carries the caller's script context, so the cached get_db() runs as it would inline.
+            add_script_run_ctx(_warm_up_thread, get_script_run_ctx(suppress_warning=True))
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+def get_db_stats():
+    """Snapshot of client health and latency stats."""
+    with _stats_lock:
+        return dict(_stats)
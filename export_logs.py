@@ -0,0 +1,255 @@
+import argparse
+import csv
+import datetime
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import streamlit as st
+from db_config import get_db
+from cache_sync import COHERENT_TTL
+from firebase_admin import firestore
+
+EXPORT_COLUMNS = ["id", "date", "day_key", "iso_week", "quarter_key", "project_id", "project_name", "pillar_id", "hours", "focus_score", "created_at"]
+EXPORT_FORMATS = {
+    "csv": {"extension": "csv", "mime": "text/csv"},
+    "jsonl": {"extension": "jsonl", "mime": "application/x-ndjson"},
+    "parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+PAGE_SIZE = 500
+MAX_IN_FILTER = 30  # Firestore limit for 'in' queries
+EXPORT_PREFIX = "work_logs_export_"
+EXPORT_MAX_AGE_SECONDS = 6 * 3600  # Export files left behind by ended sessions are removed after this
+
+@st.cache_data(ttl=COHERENT_TTL)
+def get_dimension_map():
+    """Fetches a small Project ID -> {project_name, pillar_id} map used to enrich exported rows."""
+    db = get_db()
+    dims = {}
+    for doc in db.collection("projects").stream():
+        d = doc.to_dict()
+        dims[doc.id] = {
+            "project_name": d.get("name"),
+            "pillar_id": d.get("pillar_id", "Unknown"),
+        }
+    return dims
+
+def build_logs_query(db, start=None, end=None, project_ids=None):
+    """Builds the filtered work_logs query, ordered by date so it can be paged with cursors."""
+    query = db.collection("work_logs")
+    if start is not None:
+        query = query.where(field_path="date", op_string=">=", value=start)
+    if end is not None:
+        query = query.where(field_path="date", op_string="<", value=end)
+    if project_ids and len(project_ids) <= MAX_IN_FILTER:
+        query = query.where(field_path="project_id", op_string="in", value=list(project_ids))
+    return query.order_by("date", direction=firestore.Query.ASCENDING)
+
+def count_logs(query):
+    """Server-side count for progress reporting. Returns None if aggregation is unavailable."""
+    try:
+        result = query.count().get()
+        return int(result[0][0].value)
+    except Exception:
+        return None
+
+def iter_log_pages(query, page_size=PAGE_SIZE, project_ids=None):
+    """Yields lists of raw (doc_id, dict) pairs, one Firestore page at a time.
+
+    Uses start_after() cursors so only a single page is ever held in memory.
+    """
+    # Large project filters can't go through an 'in' query, so they are applied client-side.
+    client_filter = set(project_ids) if project_ids and len(project_ids) > MAX_IN_FILTER else None
+    last_doc = None
+    while True:
+        page_query = query.limit(page_size)
+        if last_doc is not None:
+            page_query = page_query.start_after(last_doc)
+
+        docs = list(page_query.stream())
+        if not docs:
+            break
+
+        page = []
+        for doc in docs:
+            d = doc.to_dict()
+            if client_filter is None or d.get("project_id") in client_filter:
+                page.append((doc.id, d))
+        yield page, len(docs)
+
+        if len(docs) < page_size:
+            break
+        last_doc = docs[-1]
+
+def _to_cell(value):
+    """Normalizes Firestore values (timestamps, sentinels) into plain exportable values."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def to_export_row(doc_id, data, dims):
+    """Flattens a work_log into an export row, joining project/pillar names from the dimension map."""
+    dim = dims.get(data.get("project_id"), {})
+    row = {
+        "id": doc_id,
+        "date": data.get("date"),
+        "day_key": data.get("day_key"),
+        "iso_week": data.get("iso_week"),
+        "quarter_key": data.get("quarter_key"),
+        "project_id": data.get("project_id"),
+        "project_name": dim.get("project_name") or data.get("project_name"),
+        "pillar_id": dim.get("pillar_id", "Unknown"),
+        "hours": data.get("hours"),
+        "focus_score": data.get("focus_score"),
+        "created_at": data.get("created_at"),
+    }
+    return {k: _to_cell(row.get(k)) for k in EXPORT_COLUMNS}
+
+class CsvExportWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.f, fieldnames=EXPORT_COLUMNS)
+        self.writer.writeheader()
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class JsonlExportWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class ParquetExportWriter:
+    """Writes one Parquet row group per Firestore page."""
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires 'pyarrow' (pip install pyarrow).")
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.string()),
+            ("date", pa.string()),
+            ("day_key", pa.string()),
+            ("iso_week", pa.string()),
+            ("quarter_key", pa.string()),
+            ("project_id", pa.string()),
+            ("project_name", pa.string()),
+            ("pillar_id", pa.string()),
+            ("hours", pa.float64()),
+            ("focus_score", pa.float64()),
+            ("created_at", pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        columns = {name: [row.get(name) for row in rows] for name in self.schema.names}
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {
+    "csv": CsvExportWriter,
+    "jsonl": JsonlExportWriter,
+    "parquet": ParquetExportWriter,
+}
+
+def remove_stale_exports(max_age=EXPORT_MAX_AGE_SECONDS):
+    """Deletes export files in the temp dir older than `max_age` seconds. Returns the number removed."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), EXPORT_PREFIX + "*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+def new_export_path(extension):
+    """A private temp file for one export, after sweeping out stale ones."""
+    remove_stale_exports()
+    fd, path = tempfile.mkstemp(prefix=EXPORT_PREFIX, suffix=f".{extension}")
+    os.close(fd)
+    return path
+
+def export_logs(path, fmt="csv", start=None, end=None, project_ids=None, page_size=PAGE_SIZE, on_progress=None):
+    """Streams work_logs into `path` page by page and returns the number of rows written.
+
+    `on_progress(done, total)` is called after each page; `total` may be None.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    db = get_db()
+    dims = get_dimension_map()
+    query = build_logs_query(db, start, end, project_ids)
+    total = count_logs(query) if not (project_ids and len(project_ids) > MAX_IN_FILTER) else None
+
+    writer = WRITERS[fmt](path)
+    written = 0
+    scanned = 0
+    try:
+        for page, page_len in iter_log_pages(query, page_size, project_ids):
+            writer.write_rows([to_export_row(doc_id, d, dims) for doc_id, d in page])
+            written += len(page)
+            scanned += page_len
+            if on_progress:
+                on_progress(scanned, total)
+    finally:
+        writer.close()
+    return written
+
+def _parse_date(value):
+    """Parses YYYY-MM-DD into a UTC midnight datetime."""
+    d = datetime.date.fromisoformat(value)
+    return datetime.datetime.combine(d, datetime.time.min).replace(tzinfo=datetime.timezone.utc)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export work_logs to CSV, JSONL or Parquet.")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--out", required=True, help="Output file path")
+    parser.add_argument("--start", help="Inclusive start date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Inclusive end date (YYYY-MM-DD)")
+    parser.add_argument("--project", action="append", default=[], help="Project name or ID (repeatable)")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    start = _parse_date(args.start) if args.start else None
+    end = _parse_date(args.end) + datetime.timedelta(days=1) if args.end else None
+
+    project_ids = None
+    if args.project:
+        dims = get_dimension_map()
+        name_to_id = {v["project_name"]: pid for pid, v in dims.items()}
+        project_ids = [name_to_id.get(p, p) for p in args.project]
+
+    def report(done, total):
+        suffix = f"/{total}" if total is not None else ""
+        print(f"\rExported {done}{suffix} logs", end="", file=sys.stderr, flush=True)
+
+    written = export_logs(args.out, args.format, start, end, project_ids, args.page_size, report)
+    print(f"\nWrote {written} rows to {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
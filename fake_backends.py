@@ -0,0 +1,367 @@
+"""In-memory stand-ins for Firestore and Gemini, used by the load test and offline runs.
+
+Only the parts of the APIs that this project actually calls are implemented.
+"""
+import copy
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from google.cloud.firestore_v1 import transforms
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = lambda: None
+
+UTC = datetime.timezone.utc
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+def _now():
+    return datetime.datetime.now(UTC)
+
+def _normalize(value):
+    """Firestore treats naive datetimes as UTC; do the same so comparisons work."""
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value
+
+def _compare(op, left, right):
+    left, right = _normalize(left), _normalize(right)
+    try:
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        if op == ">=":
+            return left >= right
+        if op == "in":
+            return left in right
+        if op == "not-in":
+            return left not in right
+        if op == "array_contains":
+            return isinstance(left, list) and right in left
+    except TypeError:
+        # Firestore never matches across types.
+        return False
+    raise ValueError(f"Unsupported operator: {op}")
+
+class FakeAggregationResult:
+    def __init__(self, value):
+        self.alias = "count"
+        self.value = value
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self.query = query
+
+    def get(self, **kwargs):
+        return [[FakeAggregationResult(len(self.query._matching()))]]
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+class FakeDocumentReference:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self, **kwargs):
+        self._db._count_read(self._collection, 1)
+        with self._db._lock:
+            data = self._db._data[self._collection].get(self.id)
+            return FakeSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        self._db._write(self._collection, self.id, data, merge=merge)
+
+    def update(self, data):
+        with self._db._lock:
+            if self.id not in self._db._data[self._collection]:
+                raise KeyError(f"No document to update: {self.path}")
+        self._db._write(self._collection, self.id, data, merge=True)
+
+    def delete(self):
+        self._db._delete(self._collection, self.id)
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), orders=(), limit=None, start_after=None):
+        self._db = db
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._start_after = start_after
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "start_after": self._start_after,
+        }
+        state.update(changes)
+        return FakeQuery(self._db, self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document):
+        return self._copy(start_after=document)
+
+    def count(self, alias=None):
+        return FakeAggregationQuery(self)
+
+    def _matching(self):
+        with self._db._lock:
+            items = [(doc_id, copy.deepcopy(d)) for doc_id, d in self._db._data[self._collection].items()]
+
+        for field, op, value in self._filters:
+            items = [(i, d) for i, d in items if field in d and _compare(op, d[field], value)]
+
+        for field, direction in reversed(self._orders):
+            # Docs missing the order field are excluded, like Firestore.
+            items = [(i, d) for i, d in items if field in d]
+            items.sort(key=lambda item: _normalize(item[1][field]), reverse=(direction == DESCENDING))
+        return items
+
+    def stream(self, **kwargs):
+        items = self._matching()
+        if self._start_after is not None:
+            ids = [i for i, _ in items]
+            if self._start_after.id in ids:
+                items = items[ids.index(self._start_after.id) + 1:]
+        if self._limit is not None:
+            items = items[:self._limit]
+        self._db._count_read(self._collection, max(len(items), 1))
+        for doc_id, data in items:
+            yield FakeSnapshot(FakeDocumentReference(self._db, self._collection, doc_id), data)
+
+    def get(self, **kwargs):
+        return list(self.stream(**kwargs))
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self._db, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return _now(), ref
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref, data, True))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, False))
+
+    def commit(self):
+        for op, ref, data, merge in self._ops:
+            if op == "delete":
+                ref.delete()
+            elif op == "update":
+                ref.update(data)
+            else:
+                ref.set(data, merge=merge)
+        self._ops = []
+
+class FakeFirestore:
+    """Thread-safe in-memory Firestore. Counts document reads per Streamlit session."""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = defaultdict(dict)
+        self.reads = defaultdict(int)          # session_id -> documents read
+        self.reads_by_collection = defaultdict(int)
+        self.writes = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def _count_read(self, collection, n):
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id if ctx else None
+        with self._lock:
+            self.reads[session_id] += n
+            self.reads_by_collection[collection] += n
+
+    def _resolve(self, value, current):
+        if value is transforms.SERVER_TIMESTAMP:
+            return _now()
+        if isinstance(value, transforms.Increment):
+            return (current or 0) + value.value
+        if isinstance(value, dict):
+            # Maps merge key by key (like set(merge=True)), so nested transforms work.
+            return self._merge(dict(current) if isinstance(current, dict) else {}, value)
+        return copy.deepcopy(value)
+
+    def _merge(self, doc, data):
+        for key, value in data.items():
+            if value is transforms.DELETE_FIELD:
+                doc.pop(key, None)
+            else:
+                doc[key] = self._resolve(value, doc.get(key))
+        return doc
+
+    def _write(self, collection, doc_id, data, merge=False):
+        with self._lock:
+            existing = self._data[collection].get(doc_id) if merge else None
+            self._data[collection][doc_id] = self._merge(dict(existing or {}), data)
+            self.writes += 1
+
+    def _delete(self, collection, doc_id):
+        with self._lock:
+            self._data[collection].pop(doc_id, None)
+            self.writes += 1
+
+def seed_fake_db(db, n_projects=6, n_logs=2000, days=365, seed=7):
+    """Fills a FakeFirestore with pillars, projects and randomly spread work logs."""
+    from time_keys import time_keys
+
+    rng = random.Random(seed)
+    pillars = ["The Cleanup (Debt)", "The Growth Engine", "The Vertical (Finance Niche)"]
+    for name in pillars:
+        db.collection("pillars").document(name).set({"name": name, "created_at": _now()})
+
+    project_ids = []
+    for i in range(n_projects):
+        ref = db.collection("projects").document(f"proj{i}")
+        ref.set({
+            "name": f"Project {i}",
+            "pillar_id": pillars[i % len(pillars)],
+            "total_hours_budget": 100,
+            "status": "Active",
+            "quarter": "Top Priority",
+            "visibility": True,
+            "created_at": _now(),
+        })
+        project_ids.append(ref.id)
+
+    now = _now()
+    for i in range(n_logs):
+        pid = rng.choice(project_ids)
+        log_date = now - datetime.timedelta(minutes=rng.randint(0, days * 24 * 60))
+        db.collection("work_logs").document(f"log{i}").set({
+            "project_id": pid,
+            "project_name": f"Project {project_ids.index(pid)}",
+            "hours": round(rng.uniform(0.25, 3.0), 2),
+            "focus_score": rng.randint(1, 5),
+            "date": log_date,
+            **time_keys(log_date),
+            "created_at": log_date,
+        })
+    return project_ids
+
+# --- Gemini ---
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, prompt, stream=False):
+        text = self.model._reply(prompt)
+        if stream:
+            return self.model._stream(text)
+        return FakeResponse(text)
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel with configurable latency and failure rate."""
+    latency = 0.05          # seconds per call
+    chunk_latency = 0.005   # seconds between streamed chunks
+    failure_rate = 0.0
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name=None, system_instruction=None, generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+
+    def _reply(self, prompt):
+        with FakeGenerativeModel._lock:
+            FakeGenerativeModel.calls += 1
+        time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            from google.api_core import exceptions as gexc
+            raise gexc.ResourceExhausted("Fake quota exceeded")
+        if self.generation_config.get("response_mime_type") == "application/json":
+            if '"results"' in (self.system_instruction or ""):
+                # Batch audit: one verdict per "[id]" proposal in the prompt.
+                ids = re.findall(r"^\[(\d+)\]", str(prompt), re.MULTILINE)
+                return json.dumps({"results": [{"id": int(i), "status": "APPROVED", "reason": "Fake model approval."} for i in ids]})
+            return json.dumps({"status": "APPROVED", "reason": "Fake model approval."})
+        return "1. **Focus.** This is a fake strategist reply.\n2. Ship the Cleanup pillar first."
+
+    def _stream(self, text):
+        for word in text.split(" "):
+            time.sleep(self.chunk_latency)
+            yield FakeChunk(word + " ")
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        text = self._reply(contents)
+        if stream:
+            return self._stream(text)
+        return FakeResponse(text)
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history)
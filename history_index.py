@@ -0,0 +1,253 @@
+import datetime
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, defaultdict
+import pandas as pd
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "history_index.json")
+TOP_K = 5
+BM25_K1 = 1.5
+BM25_B = 0.75
+INDEX_FORMAT = 1
+SAVE_DELAY_SECONDS = 30     # Writes within this window share one background save
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 or t.isdigit()]
+
+def get_index_path():
+    return os.getenv("NORTHSTAR_INDEX_PATH", DEFAULT_INDEX_PATH)
+
+def _week_days(iso_week):
+    """Monday..Sunday dates of an ISO week key like '2026-W10'."""
+    year, week = iso_week.split("-W")
+    monday = datetime.date.fromisocalendar(int(year), int(week), 1)
+    return [monday + datetime.timedelta(days=i) for i in range(7)]
+
+class HistoryIndex:
+    """BM25 index over per-project, per-week summaries of work_logs.
+
+    Each document aggregates one project's week (hours, sessions, focus, days
+    worked) rendered as a short sentence; only its descriptive words are
+    indexed, the figures are for the reader. Logs update their summary in place,
+    so the index never has to be rebuilt for local writes.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.summaries = {}                 # doc_id -> stats dict
+        self.texts = {}                     # doc_id -> rendered summary
+        self.doc_terms = {}                 # doc_id -> distinct indexed terms
+        self.postings = defaultdict(dict)   # term -> {doc_id: tf}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.log_count = 0                  # Fingerprint of the logs the index reflects
+        self.total_hours = 0.0
+        self._save_timer = None
+
+    # --- Documents ---
+
+    @staticmethod
+    def doc_id(project_id, iso_week):
+        return f"{project_id}|{iso_week}"
+
+    def _describe(self, s):
+        """Week range, month names and days worked of a summary, shared by its text and its terms."""
+        days = _week_days(s["iso_week"])
+        months = sorted({d.strftime("%B") for d in days}, key=lambda m: datetime.datetime.strptime(m, "%B").month)
+        worked = [datetime.date.fromisoformat(k).strftime("%a %b %d") for k in sorted(s["days"])]
+        return days, months, worked
+
+    def _render(self, s):
+        days, months, worked = self._describe(s)
+        avg_focus = s["focus"] / s["count"] if s["count"] else 0
+        return (
+            f"Week {s['iso_week']} ({days[0]:%b %d} - {days[-1]:%b %d %Y}, {'/'.join(months)} {days[0].year}): "
+            f"{s['project_name']} [{s['pillar_id']}] {s['hours']:.1f}h over {s['count']} sessions, "
+            f"avg focus {avg_focus:.1f}/5, worked {', '.join(worked)}."
+        )
+
+    def _terms(self, s):
+        """BM25 terms of a summary: project, pillar, week, months and days only.
+
+        Hours, sessions and focus stay out, so a query like "Project 2" can't
+        match every week that averaged a focus of 2.0.
+        """
+        days, months, worked = self._describe(s)
+        return tokenize(
+            f"Week {s['iso_week']} {days[0]:%b %d} {days[-1]:%b %d %Y} {' '.join(months)} "
+            f"{s['project_name']} {s['pillar_id']} worked {' '.join(worked)}"
+        )
+
+    def _unindex(self, doc_id):
+        self.texts.pop(doc_id, None)
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            self.postings[term].pop(doc_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def _reindex(self, doc_id):
+        self._unindex(doc_id)
+        s = self.summaries.get(doc_id)
+        if s is None or s["count"] <= 0:
+            self.summaries.pop(doc_id, None)
+            return
+        tokens = self._terms(s)
+        counts = Counter(tokens)
+        self.texts[doc_id] = self._render(s)
+        self.doc_terms[doc_id] = list(counts)
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def _apply(self, project_id, project_name, pillar_id, iso_week, day_key, hours, focus, sign):
+        doc_id = self.doc_id(project_id, iso_week)
+        s = self.summaries.setdefault(doc_id, {
+            "project_id": project_id, "project_name": project_name, "pillar_id": pillar_id,
+            "iso_week": iso_week, "hours": 0.0, "focus": 0.0, "count": 0, "days": {},
+        })
+        s["project_name"] = project_name or s["project_name"]
+        s["pillar_id"] = pillar_id or s["pillar_id"]
+        s["hours"] += sign * hours
+        s["focus"] += sign * focus
+        s["count"] += sign
+        s["days"][day_key] = s["days"].get(day_key, 0) + sign
+        if s["days"][day_key] <= 0:
+            del s["days"][day_key]
+        self.log_count += sign
+        self.total_hours += sign * hours
+        self._reindex(doc_id)
+
+    def add_log(self, project_id, project_name, pillar_id, iso_week, day_key, hours, focus_score):
+        with self._lock:
+            self._apply(project_id, project_name, pillar_id or "Unknown", iso_week, day_key, float(hours or 0), float(focus_score or 0), 1)
+
+    def remove_log(self, project_id, project_name, pillar_id, iso_week, day_key, hours, focus_score):
+        with self._lock:
+            self._apply(project_id, project_name, pillar_id or "Unknown", iso_week, day_key, float(hours or 0), float(focus_score or 0), -1)
+
+    # --- Retrieval ---
+
+    def search(self, query, k=TOP_K):
+        """Top-k summaries for `query` by BM25. Returns [(score, text)]."""
+        with self._lock:
+            n = len(self.texts)
+            if not n:
+                return []
+            avg_len = self.total_length / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+            best = sorted(scores.items(), key=lambda x: -x[1])[:k]
+            return [(score, self.texts[doc_id]) for doc_id, score in best]
+
+    def matches(self, log_count, total_hours):
+        return self.log_count == log_count and abs(self.total_hours - total_hours) < 1e-6
+
+    # --- Build / persistence ---
+
+    @classmethod
+    def from_frame(cls, df_logs):
+        """Builds every summary with one groupby over the logs frame (compacted rows count `log_count` logs)."""
+        index = cls()
+        if df_logs.empty:
+            return index
+        df = df_logs.copy()
+        df["pillar_id"] = df["pillar_id"].fillna("Unknown") if "pillar_id" in df.columns else "Unknown"
+        df["log_count"] = df["log_count"].fillna(1).astype(int) if "log_count" in df.columns else 1
+        df["focus_score"] = pd.to_numeric(df["focus_score"], errors="coerce").fillna(0) * df["log_count"]
+        grouped = df.groupby(["project_id", "iso_week"])
+        for (project_id, iso_week), g in grouped:
+            index.summaries[cls.doc_id(project_id, iso_week)] = {
+                "project_id": project_id,
+                "project_name": g["project_name"].iloc[0],
+                "pillar_id": g["pillar_id"].iloc[0],
+                "iso_week": iso_week,
+                "hours": float(g["hours"].sum()),
+                "focus": float(g["focus_score"].sum()),
+                "count": int(g["log_count"].sum()),
+                "days": {k: int(v) for k, v in g.groupby("day_key")["log_count"].sum().items()},
+            }
+        for doc_id in list(index.summaries):
+            index._reindex(doc_id)
+        index.log_count = int(df["log_count"].sum())
+        index.total_hours = float(df["hours"].sum())
+        return index
+
+    def save(self, path=None):
+        """Atomically writes the summaries (postings are rebuilt on load)."""
+        path = path or get_index_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            payload = {
+                "format": INDEX_FORMAT,
+                "log_count": self.log_count,
+                "total_hours": self.total_hours,
+                "summaries": self.summaries,
+            }
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+        os.replace(tmp, path)
+
+    def save_later(self, path=None, delay=SAVE_DELAY_SECONDS):
+        """Schedules save() on a background thread, coalescing writes that land within `delay`.
+
+        A save lost to a process exit only costs a rebuild on the next start:
+        the fingerprint won't match the logs.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(delay, self._flush, args=(path,))
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _flush(self, path):
+        with self._lock:
+            self._save_timer = None
+        self.save(path)
+
+    @classmethod
+    def load(cls, path=None):
+        """Loads a saved index, or returns None if there isn't a usable one."""
+        path = path or get_index_path()
+        try:
+            with open(path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("format") != INDEX_FORMAT:
+            return None
+        index = cls()
+        index.summaries = payload["summaries"]
+        index.log_count = payload["log_count"]
+        index.total_hours = payload["total_hours"]
+        for doc_id in list(index.summaries):
+            index._reindex(doc_id)
+        return index
+
+def load_or_build(df_logs, path=None):
+    """Uses the on-disk index when it reflects the same logs, otherwise rebuilds and saves it."""
+    log_count = int(df_logs["log_count"].sum()) if "log_count" in df_logs.columns else int(len(df_logs))
+    total_hours = float(df_logs["hours"].sum()) if not df_logs.empty else 0.0
+    index = HistoryIndex.load(path)
+    if index is None or not index.matches(log_count, total_hours):
+        index = HistoryIndex.from_frame(df_logs)
+        index.save(path)
+    return index
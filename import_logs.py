@@ -0,0 +1,317 @@
+import argparse
+import datetime
+import io
+import re
+import sys
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+from db_config import get_db
+from time_keys import add_time_keys, get_timezone
+from firebase_admin import firestore
+
+IMPORT_FORMATS = {
+    "csv": {"extensions": ["csv"]},
+    "ics": {"extensions": ["ics", "ical"]},
+}
+BATCH_SIZE = 500  # Firestore batch write limit
+DEFAULT_FOCUS = 3
+MAX_HOURS = 24.0
+STATUS_OK = "ok"
+
+# Accepted CSV headers (lower-cased) for each field; the export format round-trips.
+CSV_ALIASES = {
+    "project_name": ["project_name", "project", "name"],
+    "project_id": ["project_id"],
+    "date": ["date", "start", "start_time", "day"],
+    "end": ["end", "end_time"],
+    "hours": ["hours", "duration", "duration_hours"],
+    "focus_score": ["focus_score", "focus"],
+}
+PREVIEW_COLUMNS = ["project_name", "project_id", "date", "hours", "focus_score", "import_hash", "status"]
+
+_FOCUS_RE = re.compile(r"focus\s*[:=]?\s*([1-5])", re.IGNORECASE)
+
+def _localize(parsed, tz):
+    """Naive timestamps are read in the reporting time zone; everything ends up in UTC."""
+    if parsed.dt.tz is None:
+        parsed = parsed.dt.tz_localize(tz, ambiguous="NaT", nonexistent="NaT")
+    return parsed.dt.tz_convert("UTC")
+
+def _to_utc(values, tz):
+    try:
+        parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            raise ValueError("mixed time zones")
+    except (ValueError, TypeError):
+        # Mixed offsets in one column: let pandas normalize them (naive values count as UTC).
+        parsed = pd.to_datetime(values, errors="coerce", format="mixed", utc=True)
+    return _localize(parsed, tz)
+
+# --- Parsers: raw file -> frame with project_name, project_id, date, hours, focus_score ---
+
+def parse_csv(data, tz=None):
+    tz = tz or get_timezone()
+    raw = pd.read_csv(io.BytesIO(data), dtype=str, skipinitialspace=True)
+    raw.columns = [str(c).strip().lower() for c in raw.columns]
+    cols = {}
+    for field, aliases in CSV_ALIASES.items():
+        match = next((a for a in aliases if a in raw.columns), None)
+        cols[field] = raw[match] if match else pd.Series(np.nan, index=raw.index, dtype=object)
+
+    df = pd.DataFrame({
+        "project_name": cols["project_name"],
+        "project_id": cols["project_id"],
+        "date": _to_utc(cols["date"], tz),
+        "hours": pd.to_numeric(cols["hours"], errors="coerce"),
+        "focus_score": pd.to_numeric(cols["focus_score"], errors="coerce"),
+    })
+    # Start/end exports (no duration column): derive hours from the time block.
+    end = _to_utc(cols["end"], tz)
+    df["hours"] = df["hours"].fillna((end - df["date"]).dt.total_seconds() / 3600)
+    return df
+
+def _unfold(text):
+    """RFC 5545 line unfolding: continuation lines start with a space or tab."""
+    lines = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and lines:
+            lines[-1] += line[1:]
+        else:
+            lines.append(line)
+    return lines
+
+def _ics_datetime(params, value, tz):
+    """Returns an aware datetime, or None for all-day (VALUE=DATE) or unreadable values."""
+    if params.get("VALUE") == "DATE" or "T" not in value:
+        return None
+    try:
+        dt = datetime.datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None
+    if value.endswith("Z"):
+        return dt.replace(tzinfo=datetime.timezone.utc)
+    try:
+        return dt.replace(tzinfo=ZoneInfo(params["TZID"]) if "TZID" in params else tz)
+    except Exception:
+        return dt.replace(tzinfo=tz)
+
+def _ics_duration(value):
+    """Parses DURATION like PT1H30M or P1DT2H into hours."""
+    m = re.fullmatch(r"P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?", value.strip())
+    if not m:
+        return None
+    w, d, h, mi, s = (int(x or 0) for x in m.groups())
+    return (w * 7 + d) * 24 + h + mi / 60 + s / 3600
+
+def parse_ics(data, tz=None):
+    """One row per VEVENT: SUMMARY is the project name, DTSTART/DTEND (or DURATION) the time block.
+
+    A 'Focus: 4' note in the DESCRIPTION sets the focus score.
+    """
+    tz = tz or get_timezone()
+    rows = []
+    event = None
+    for line in _unfold(data.decode("utf-8", errors="replace")):
+        if line == "BEGIN:VEVENT":
+            event = {}
+            continue
+        if line == "END:VEVENT":
+            if event is not None:
+                start, end = event.get("DTSTART"), event.get("DTEND")
+                hours = (end - start).total_seconds() / 3600 if start and end else event.get("DURATION")
+                focus = _FOCUS_RE.search(event.get("DESCRIPTION", ""))
+                rows.append({
+                    "project_name": event.get("SUMMARY"),
+                    "project_id": None,
+                    "date": start,
+                    "hours": hours,
+                    "focus_score": int(focus.group(1)) if focus else None,
+                })
+            event = None
+            continue
+        if event is None or ":" not in line:
+            continue
+        head, value = line.split(":", 1)
+        name, *param_parts = head.split(";")
+        params = dict(p.split("=", 1) for p in param_parts if "=" in p)
+        name = name.upper()
+        if name in ("DTSTART", "DTEND"):
+            event[name] = _ics_datetime(params, value, tz)
+        elif name == "DURATION":
+            event[name] = _ics_duration(value)
+        elif name in ("SUMMARY", "DESCRIPTION"):
+            event[name] = value.replace("\\,", ",").replace("\\;", ";").replace("\\n", " ").strip()
+
+    df = pd.DataFrame(rows, columns=["project_name", "project_id", "date", "hours", "focus_score"])
+    df["date"] = pd.to_datetime(df["date"], utc=True)
+    df["hours"] = pd.to_numeric(df["hours"], errors="coerce")
+    df["focus_score"] = pd.to_numeric(df["focus_score"], errors="coerce")
+    return df
+
+PARSERS = {
+    "csv": parse_csv,
+    "ics": parse_ics,
+}
+
+def detect_format(filename):
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    for fmt, spec in IMPORT_FORMATS.items():
+        if ext in spec["extensions"]:
+            return fmt
+    raise ValueError(f"Unsupported import file: {filename} (expected .csv or .ics)")
+
+# --- Validation ---
+
+def content_hashes(df):
+    """Stable 16-hex-digit hash of (project_id, start minute, hours to 0.01) per row.
+
+    Computed for the whole frame at once, so imported rows can be checked
+    against each other and against logs already in the database.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    keys = pd.DataFrame({
+        "project_id": df["project_id"].astype(str),
+        "minute": pd.to_datetime(df["date"], utc=True).dt.as_unit("s").astype("int64") // 60,
+        "centi_hours": (pd.to_numeric(df["hours"], errors="coerce") * 100).round().astype("Int64"),
+    })
+    return pd.util.hash_pandas_object(keys, index=False).map("{:016x}".format)
+
+def validate_logs(df, project_map, existing=None, compacted=None, tz=None):
+    """Maps projects, checks every field and flags duplicates in one vectorized pass.
+
+    `project_map` is get_projects()'s name -> id map; `existing` is a logs frame
+    (project_id, date, hours) to dedupe against. Compacted history has no raw
+    logs left to match, so rows landing on a (project_id, day_key) in
+    `compacted` (the summary day buckets) are rejected instead. Returns the
+    preview frame with a `status` column that is STATUS_OK for rows that will
+    be written.
+    """
+    df = df.copy()
+    name_lookup = {name.strip().casefold(): pid for name, pid in project_map.items()}
+    id_to_name = {pid: name for name, pid in project_map.items()}
+
+    by_name = df["project_name"].astype("string").str.strip().str.casefold().map(name_lookup)
+    by_id = df["project_id"].where(df["project_id"].isin(list(id_to_name)))
+    df["project_id"] = by_name.fillna(by_id)
+    df["project_name"] = df["project_id"].map(id_to_name).fillna(df["project_name"])
+    df["focus_score"] = df["focus_score"].fillna(DEFAULT_FOCUS).round()
+
+    bad_project = df["project_id"].isna()
+    bad_date = df["date"].isna()
+    future = ~bad_date & (df["date"] > pd.Timestamp.now(tz="UTC"))
+    bad_hours = df["hours"].isna() | (df["hours"] <= 0) | (df["hours"] > MAX_HOURS)
+    bad_focus = ~df["focus_score"].between(1, 5)
+    valid = ~(bad_project | bad_date | future | bad_hours | bad_focus)
+
+    df["import_hash"] = None
+    df.loc[valid, "import_hash"] = content_hashes(df[valid])
+    dup_in_file = valid & df["import_hash"].duplicated(keep="first")
+    already_logged = pd.Series(False, index=df.index)
+    if existing is not None and not existing.empty:
+        already_logged = valid & df["import_hash"].isin(set(content_hashes(existing.dropna(subset=["project_id", "date", "hours"]))))
+    already_compacted = pd.Series(False, index=df.index)
+    if compacted is not None and not compacted.empty and valid.any():
+        buckets = pd.MultiIndex.from_frame(compacted[["project_id", "day_key"]].astype(str))
+        keys = add_time_keys(df.loc[valid, ["project_id", "date"]], tz or get_timezone())
+        rows = pd.MultiIndex.from_arrays([keys["project_id"].astype(str), keys["day_key"].astype(str)])
+        already_compacted[valid] = rows.isin(buckets)
+
+    df["status"] = np.select(
+        [bad_project, bad_date, future, bad_hours, bad_focus, dup_in_file, already_logged, already_compacted],
+        ["unknown project", "bad date", "future date", f"hours not in (0, {MAX_HOURS:g}]", "focus not 1-5", "duplicate in file", "already logged",
+         "day already compacted"],
+        default=STATUS_OK,
+    )
+    return df[PREVIEW_COLUMNS]
+
+def summarize(preview):
+    """Counts per status, e.g. {'ok': 120, 'already logged': 3}."""
+    return preview["status"].value_counts().to_dict()
+
+# --- Writes ---
+
+def write_logs(db, preview, source="import", batch_size=BATCH_SIZE, on_progress=None):
+    """Commits the STATUS_OK rows of a preview in batches of up to 500. Returns the number written.
+
+    Document IDs derive from the content hash, so re-running an interrupted
+    import overwrites instead of duplicating. Callers bump cache versions.
+    """
+    rows = preview[preview["status"] == STATUS_OK].drop(columns=["status"])
+    if rows.empty:
+        return 0
+    rows = add_time_keys(rows.copy())
+    rows["focus_score"] = rows["focus_score"].astype(int)
+    rows["hours"] = rows["hours"].astype(float)
+
+    logs = db.collection("work_logs")
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        batch = db.batch()
+        chunk = rows.iloc[start:start + batch_size]
+        for r in chunk.to_dict("records"):
+            batch.set(logs.document(f"import-{r['import_hash']}"), {
+                **r,
+                "source": source,
+                "created_at": firestore.SERVER_TIMESTAMP,
+            })
+        batch.commit()
+        written += len(chunk)
+        if on_progress:
+            on_progress(written, len(rows))
+    return written
+
+def import_file(data, filename, project_map, existing=None, tz=None, compacted=None):
+    """Parses and validates an uploaded file. Returns the preview frame (nothing is written)."""
+    fmt = detect_format(filename)
+    return validate_logs(PARSERS[fmt](data, tz), project_map, existing, compacted, tz)
+
+def _existing_logs(db):
+    """Loads just the dedupe fields of every work_log, page by page."""
+    from export_logs import build_logs_query, iter_log_pages
+    rows = []
+    for page, _ in iter_log_pages(build_logs_query(db)):
+        rows.extend({"project_id": d.get("project_id"), "date": d.get("date"), "hours": d.get("hours")} for _, d in page)
+    return pd.DataFrame(rows, columns=["project_id", "date", "hours"])
+
+def _compacted_days(db):
+    """(project_id, day_key) buckets already rolled into monthly summaries."""
+    from compaction import summaries_to_frame, SUMMARY_COLLECTION
+    df = summaries_to_frame([doc.to_dict() for doc in db.collection(SUMMARY_COLLECTION).stream()])
+    return df[["project_id", "day_key"]] if not df.empty else None
+
+def imported_day_keys(preview):
+    """The distinct day_keys of the rows write_logs() commits."""
+    return add_time_keys(preview[preview["status"] == STATUS_OK].copy())["day_key"].unique().tolist()
+
+def main(argv=None):
+    from cache_sync import bump_versions
+    from reports import invalidate_reports
+
+    parser = argparse.ArgumentParser(description="Import past time blocks from CSV or iCalendar into work_logs.")
+    parser.add_argument("path", help="CSV or .ics file")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing")
+    args = parser.parse_args(argv)
+
+    db = get_db()
+    project_map = {d.to_dict().get("name"): d.id for d in db.collection("projects").stream() if d.to_dict().get("name")}
+    with open(args.path, "rb") as f:
+        preview = import_file(f.read(), args.path, project_map, _existing_logs(db), compacted=_compacted_days(db))
+
+    for status, count in summarize(preview).items():
+        print(f"{status}: {count}", file=sys.stderr)
+    if args.dry_run:
+        return
+
+    def report(done, total):
+        print(f"\rImported {done}/{total} logs", end="", file=sys.stderr, flush=True)
+
+    written = write_logs(db, preview, source=f"import:{detect_format(args.path)}", on_progress=report)
+    if written:
+        bump_versions(db, "work_logs")
+        invalidate_reports(db, imported_day_keys(preview))
+    print(f"\nImported {written} logs.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import collections
+import os
+import random
+import threading
+import time
+import streamlit as st
+import google.generativeai as genai
+from google.api_core import exceptions as gexc
+from db_config import load_settings
+
+DEFAULT_SETTINGS = {
+    "max_concurrency": 4,       # In-flight Gemini calls per process
+    "requests_per_minute": 60,  # Token bucket refill rate
+    "burst": 10,                # Token bucket capacity
+    "max_queue": 50,            # Waiting callers before new ones are rejected
+    "queue_timeout": 60.0,      # Seconds a caller may wait for a slot
+    "max_retries": 3,
+    "backoff_base": 1.0,
+    "backoff_max": 20.0,
+    "fake": False,              # Use fake_backends.FakeGenerativeModel (testing / offline)
+}
+
+# 429 and 5xx: worth retrying after a pause.
+RETRYABLE_ERRORS = (
+    gexc.ResourceExhausted,
+    gexc.TooManyRequests,
+    gexc.ServiceUnavailable,
+    gexc.InternalServerError,
+    gexc.DeadlineExceeded,
+)
+
+class GatewayBusy(Exception):
+    """Raised when the queue is full or a caller waited too long for a slot."""
+
+def get_settings():
+    """Defaults, then an optional [llm] secrets section, then NORTHSTAR_LLM_<KEY> env vars."""
+    return load_settings(DEFAULT_SETTINGS, "llm", "NORTHSTAR_LLM_")
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class LLMGateway:
+    """Process-wide front door for Gemini calls.
+
+    Callers queue per session and are admitted round-robin across sessions,
+    subject to a concurrency limit and a token-bucket rate limit. Quota and
+    server errors are retried with jittered exponential backoff.
+    """
+    def __init__(self, settings=None, model_factory=None):
+        self.settings = settings or get_settings()
+        if model_factory is None:
+            if self.settings["fake"]:
+                from fake_backends import FakeGenerativeModel
+                model_factory = FakeGenerativeModel
+            else:
+                # Looked up per call so genai.GenerativeModel can be swapped out in tests.
+                model_factory = lambda *args, **kwargs: genai.GenerativeModel(*args, **kwargs)
+        self.model_factory = model_factory
+
+        self._cond = threading.Condition()
+        self._bucket = TokenBucket(self.settings["requests_per_minute"] / 60.0, self.settings["burst"])
+        self._queues = collections.OrderedDict()  # session_id -> deque of tickets (round-robin order)
+        self._waiting = 0
+        self._in_flight = 0
+
+        self._metrics_lock = threading.Lock()
+        self._counters = collections.Counter()
+        self._wait_times = collections.deque(maxlen=500)
+        self._latencies = collections.deque(maxlen=500)
+
+    # --- Admission ---
+
+    def _is_next(self, session_id, ticket):
+        # Head ticket of the first session in round-robin order.
+        first_sid = next(iter(self._queues), None)
+        return first_sid == session_id and self._queues[first_sid][0] is ticket
+
+    def _acquire(self, session_id):
+        timeout = self.settings["queue_timeout"]
+        t0 = time.monotonic()
+        with self._cond:
+            if self._waiting >= self.settings["max_queue"]:
+                self._count("rejected")
+                raise GatewayBusy("Too many AI requests queued. Please try again shortly.")
+            ticket = object()
+            self._queues.setdefault(session_id, collections.deque()).append(ticket)
+            self._waiting += 1
+            try:
+                while True:
+                    if self._is_next(session_id, ticket) and self._in_flight < self.settings["max_concurrency"]:
+                        if self._bucket.try_take():
+                            break
+                        wait = self._bucket.wait_time()
+                    else:
+                        wait = None
+                    remaining = timeout - (time.monotonic() - t0)
+                    if remaining <= 0:
+                        self._count("timed_out")
+                        raise GatewayBusy("Timed out waiting for an AI slot. Please try again shortly.")
+                    self._cond.wait(min(wait, remaining) if wait is not None else remaining)
+            except BaseException:
+                self._queues[session_id].remove(ticket)
+                if not self._queues[session_id]:
+                    del self._queues[session_id]
+                self._waiting -= 1
+                self._cond.notify_all()
+                raise
+
+            # Admitted: pop the ticket and move this session to the back of the line.
+            queue = self._queues.pop(session_id)
+            queue.popleft()
+            if queue:
+                self._queues[session_id] = queue
+            self._waiting -= 1
+            self._in_flight += 1
+            self._cond.notify_all()
+        with self._metrics_lock:
+            self._wait_times.append(time.monotonic() - t0)
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    # --- Calls ---
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff."""
+        cap = min(self.settings["backoff_max"], self.settings["backoff_base"] * (2 ** attempt))
+        time.sleep(random.uniform(0, cap))
+
+    def _call(self, session_id, fn):
+        t0 = time.monotonic()
+        attempt = 0
+        while True:
+            self._acquire(session_id)
+            try:
+                result = fn()
+                self._count("completed")
+                self._record_latency(time.monotonic() - t0)
+                return result
+            except RETRYABLE_ERRORS:
+                if attempt >= self.settings["max_retries"]:
+                    self._count("failed")
+                    raise
+            except Exception:
+                self._count("failed")
+                raise
+            finally:
+                self._release()
+            self._count("retried")
+            self._backoff(attempt)
+            attempt += 1
+
+    def generate(self, session_id, model_name, contents, system_instruction=None, generation_config=None):
+        """One-shot generate_content() through the gateway. Returns the response."""
+        model = self.model_factory(model_name, system_instruction=system_instruction, generation_config=generation_config)
+        return self._call(session_id, lambda: model.generate_content(contents))
+
+    def chat_stream(self, session_id, model_name, history, prompt, system_instruction=None):
+        """Streams a chat reply as text chunks.
+
+        The slot is held until the stream is exhausted or closed. Retries only
+        happen before the first chunk, so no text is ever repeated.
+        """
+        model = self.model_factory(model_name, system_instruction=system_instruction)
+        t0 = time.monotonic()
+        attempt = 0
+        while True:
+            self._acquire(session_id)
+            try:
+                chat = model.start_chat(history=history)
+                response = iter(chat.send_message(prompt, stream=True))
+                first = next(response, None)
+                break
+            except RETRYABLE_ERRORS:
+                self._release()
+                if attempt >= self.settings["max_retries"]:
+                    self._count("failed")
+                    raise
+            except Exception:
+                self._release()
+                self._count("failed")
+                raise
+            self._count("retried")
+            self._backoff(attempt)
+            attempt += 1
+
+        try:
+            if first is not None:
+                yield first.text
+            for chunk in response:
+                yield chunk.text
+            self._count("completed")
+        except GeneratorExit:
+            raise
+        except Exception:
+            self._count("failed")
+            raise
+        finally:
+            self._record_latency(time.monotonic() - t0)
+            self._release()
+
+    # --- Metrics ---
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._counters[name] += 1
+
+    def _record_latency(self, seconds):
+        with self._metrics_lock:
+            self._latencies.append(seconds)
+
+    def get_metrics(self):
+        def pct(values, p):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return ordered[min(int(round(p / 100.0 * (len(ordered) - 1))), len(ordered) - 1)]
+
+        with self._cond:
+            queue_depth, in_flight = self._waiting, self._in_flight
+        with self._metrics_lock:
+            waits, lats = list(self._wait_times), list(self._latencies)
+            counters = dict(self._counters)
+        return {
+            "queue_depth": queue_depth,
+            "in_flight": in_flight,
+            "completed": counters.get("completed", 0),
+            "failed": counters.get("failed", 0),
+            "retried": counters.get("retried", 0),
+            "rejected": counters.get("rejected", 0) + counters.get("timed_out", 0),
+            "wait_p50": pct(waits, 50),
+            "wait_p95": pct(waits, 95),
+            "latency_p50": pct(lats, 50),
+            "latency_p95": pct(lats, 95),
+        }
+
+@st.cache_resource
+def get_llm_gateway():
+    return LLMGateway()
+
+def get_session_key():
+    """Stable per-browser-session key used for fair queueing."""
+    if "llm_session_key" not in st.session_state:
+        st.session_state["llm_session_key"] = os.urandom(8).hex()
+    return st.session_state["llm_session_key"]
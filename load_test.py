@@ -0,0 +1,247 @@
+"""Concurrent-user load test for app.py.
+
+Runs N simulated sessions with streamlit.testing.v1.AppTest against an in-memory
+Firestore and a fake Gemini model, then checks latency/CPU/memory/read budgets.
+
+    python load_test.py --users 20 --p95-ms 1500 --max-reads-per-user 20000
+"""
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import db_config
+import fake_backends
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+DEFAULT_BUDGETS = {
+    "p95_ms": 2000.0,
+    "cpu_seconds_per_user": 10.0,
+    "max_rss_mb": 1024.0,
+    "reads_per_user": 50000,
+}
+
+# Log Work goes last: its run ends in a timeout (the timer never stops rerunning),
+# which leaves the AppTest element tree unusable for further navigation.
+PAGES = ["Home", "Quarterly Perf.", "Settings", "AI Coach", "Log Work"]
+
+# Wrapper script executed by AppTest: times every script pass (including the
+# ones cut short by st.rerun) and attributes it to the simulated user.
+WRAPPER_SCRIPT = f"""
+import runpy
+import time
+import load_test
+t0 = time.perf_counter()
+load_test.begin_pass()
+try:
+    runpy.run_path({APP_PATH!r}, run_name="__main__")
+finally:
+    load_test.end_pass(time.perf_counter() - t0)
+"""
+
+_lock = threading.Lock()
+_sessions = {}                   # session_id -> (user, page)
+_passes = defaultdict(list)      # page -> [latency seconds]
+_sleep_state = threading.local()
+_real_sleep = time.sleep
+
+def _tracked_sleep(seconds):
+    """time.sleep that remembers how long the current script thread slept."""
+    _sleep_state.slept = getattr(_sleep_state, "slept", 0.0) + seconds
+    _real_sleep(seconds)
+
+def begin_pass():
+    _sleep_state.slept = 0.0
+    ctx = get_script_run_ctx()
+    user = st.session_state.get("_load_user")
+    page = st.session_state.get("_load_page")
+    if ctx is not None:
+        with _lock:
+            _sessions[ctx.session_id] = (user, page)
+
+def end_pass(elapsed):
+    # The app deliberately sleeps (timer tick, toast delays); that's idle time, not work.
+    busy = max(elapsed - getattr(_sleep_state, "slept", 0.0), 0.0)
+    page = st.session_state.get("_load_page")
+    with _lock:
+        _passes[page].append(busy)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[idx]
+
+def _pin_runtime():
+    """AppTest installs a mock Runtime per run and resets it to None afterwards.
+
+    With several users running concurrently, one run's reset would pull the
+    runtime out from under another user's script thread, so keep handing out
+    the last mock instead.
+    """
+    real_instance = Runtime.instance.__func__
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        return last.get("runtime") or real_instance(cls)
+    Runtime.instance = classmethod(instance)
+
+def install_fakes(db):
+    """Routes the app to the in-memory backends. Nothing in app.py is modified."""
+    import google.generativeai as genai
+    db_config.create_client = lambda settings=None: db
+    genai.GenerativeModel = fake_backends.FakeGenerativeModel
+    genai.configure = lambda **kwargs: None
+    time.sleep = _tracked_sleep
+    _pin_runtime()
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+def simulate_user(user, timer_seconds, timeout):
+    """One user walks through every page, keeping Log Work open while the timer ticks."""
+    at = AppTest.from_string(WRAPPER_SCRIPT, default_timeout=timeout)
+    at.secrets["GOOGLE_API_KEY"] = "fake-key"
+    at.session_state["_load_user"] = user
+    errors = []
+
+    for i, page in enumerate(PAGES):
+        at.session_state["_load_page"] = page
+        try:
+            # The first run lands on Home; after that, navigate via the sidebar.
+            if i > 0:
+                at.sidebar.radio[0].set_value(page)
+            # The running timer on Log Work reruns every second until the test stops it.
+            at.run(timeout=timer_seconds if page == "Log Work" else None)
+        except RuntimeError as e:
+            if page != "Log Work" or "timed out" not in str(e):
+                errors.append(f"{page}: {e}")
+        else:
+            if at.exception:
+                errors.append(f"{page}: {at.exception[0].message}")
+
+        if page == "AI Coach" and at.chat_input:
+            at.chat_input[0].set_value("How is my week going?")
+            try:
+                at.run()
+            except RuntimeError as e:
+                errors.append(f"AI Coach chat: {e}")
+    return errors
+
+def run_load_test(users, timer_seconds=3.0, timeout=30.0, n_logs=2000, n_projects=6):
+    db = fake_backends.FakeFirestore()
+    fake_backends.seed_fake_db(db, n_projects=n_projects, n_logs=n_logs)
+    # A running timer in the shared current_session document.
+    db.collection("active_sessions").document("current_session").set({
+        "project_name": "Project 0",
+        "project_id": "proj0",
+        "start_time": fake_backends._now(),
+    })
+    install_fakes(db)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = list(pool.map(lambda u: simulate_user(u, timer_seconds, timeout), range(users)))
+
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    reads_per_user = defaultdict(int)
+    with _lock:
+        for session_id, n in db.reads.items():
+            user = _sessions.get(session_id, (None, None))[0]
+            reads_per_user[user] += n
+        all_passes = [x for v in _passes.values() for x in v]
+        by_page = {page: list(v) for page, v in _passes.items()}
+
+    return {
+        "users": users,
+        "wall_seconds": wall,
+        "reruns": len(all_passes),
+        "p50_ms": percentile(all_passes, 50) * 1000,
+        "p95_ms": percentile(all_passes, 95) * 1000,
+        "by_page_p95_ms": {page: percentile(v, 95) * 1000 for page, v in by_page.items()},
+        "cpu_seconds_per_user": cpu / users,
+        "rss_peak_mb": rss_peak,
+        "rss_growth_mb": rss_peak - rss_before,
+        "reads_per_user": max(reads_per_user.values()) if reads_per_user else 0,
+        "reads_by_collection": dict(db.reads_by_collection),
+        "llm_calls": fake_backends.FakeGenerativeModel.calls,
+        "errors": [e for errs in results for e in errs],
+    }
+
+def check_budgets(report, budgets):
+    """Returns a list of human-readable budget violations."""
+    failures = []
+    if report["p95_ms"] > budgets["p95_ms"]:
+        failures.append(f"p95 rerun latency {report['p95_ms']:.0f} ms > {budgets['p95_ms']:.0f} ms")
+    if report["cpu_seconds_per_user"] > budgets["cpu_seconds_per_user"]:
+        failures.append(f"CPU {report['cpu_seconds_per_user']:.2f} s/user > {budgets['cpu_seconds_per_user']:.2f} s/user")
+    if report["rss_peak_mb"] > budgets["max_rss_mb"]:
+        failures.append(f"Peak RSS {report['rss_peak_mb']:.0f} MB > {budgets['max_rss_mb']:.0f} MB")
+    if report["reads_per_user"] > budgets["reads_per_user"]:
+        failures.append(f"Reads {report['reads_per_user']} /user > {budgets['reads_per_user']} /user")
+    if report["errors"]:
+        failures.append(f"{len(report['errors'])} page errors (first: {report['errors'][0]})")
+    return failures
+
+def print_report(report):
+    print(f"Users: {report['users']}  Wall: {report['wall_seconds']:.1f}s  Reruns: {report['reruns']}")
+    print(f"Rerun latency p50: {report['p50_ms']:.0f} ms  p95: {report['p95_ms']:.0f} ms")
+    for page, p95 in sorted(report["by_page_p95_ms"].items(), key=lambda x: str(x[0])):
+        print(f"  {page}: p95 {p95:.0f} ms")
+    print(f"CPU: {report['cpu_seconds_per_user']:.2f} s/user  Peak RSS: {report['rss_peak_mb']:.0f} MB (+{report['rss_growth_mb']:.0f})")
+    print(f"Backend reads: {report['reads_per_user']} max/user  {report['reads_by_collection']}")
+    print(f"LLM calls: {report['llm_calls']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the Streamlit app.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--logs", type=int, default=2000, help="Work logs to seed")
+    parser.add_argument("--projects", type=int, default=6)
+    parser.add_argument("--timer-seconds", type=float, default=3.0, help="How long each user keeps the running timer open")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-run AppTest timeout")
+    parser.add_argument("--p95-ms", type=float, default=DEFAULT_BUDGETS["p95_ms"])
+    parser.add_argument("--max-cpu-per-user", type=float, default=DEFAULT_BUDGETS["cpu_seconds_per_user"])
+    parser.add_argument("--max-rss-mb", type=float, default=DEFAULT_BUDGETS["max_rss_mb"])
+    parser.add_argument("--max-reads-per-user", type=int, default=DEFAULT_BUDGETS["reads_per_user"])
+    args = parser.parse_args(argv)
+
+    budgets = {
+        "p95_ms": args.p95_ms,
+        "cpu_seconds_per_user": args.max_cpu_per_user,
+        "max_rss_mb": args.max_rss_mb,
+        "reads_per_user": args.max_reads_per_user,
+    }
+    report = run_load_test(args.users, args.timer_seconds, args.timeout, args.logs, args.projects)
+    print_report(report)
+
+    failures = check_budgets(report, budgets)
+    if failures:
+        print("\nFAILED budgets:")
+        for f in failures:
+            print(f"  - {f}")
+        return 1
+    print("\nAll budgets met.")
+    return 0
+
+if __name__ == "__main__":
+    # The AppTest wrapper imports this module by name; make it share our state.
+    sys.modules.setdefault("load_test", sys.modules[__name__])
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import argparse
+import datetime
+import html
+import os
+import sys
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+from db_config import get_db, call_options
+from time_keys import current_keys
+from cache_sync import bump_versions, BUMP_BATCH_SIZE
+from firebase_admin import firestore
+
+REPORTS_COLLECTION = "reports"
+PERIOD_KINDS = {"quarter": "quarter_key", "week": "iso_week"}
+
+# --- Periods ---
+
+def period_end(period_key):
+    """Last day of a quarter ("Q3-2026") or ISO week ("2026-W41")."""
+    if period_key.startswith("Q"):
+        quarter, year = int(period_key[1]), int(period_key[3:])
+        if quarter == 4:
+            return datetime.date(year, 12, 31)
+        return datetime.date(year, quarter * 3 + 1, 1) - datetime.timedelta(days=1)
+    year, week = period_key.split("-W")
+    return datetime.date.fromisocalendar(int(year), int(week), 7)
+
+def is_closed(period_key, day_key=None):
+    """True once the period is over, so its report can no longer change unless logs are backfilled."""
+    day_key = day_key or current_keys()["day_key"]
+    return period_end(period_key) < datetime.date.fromisoformat(day_key)
+
+def periods_for_days(day_keys):
+    """The quarter and week period keys covering the given day_keys."""
+    periods = set()
+    for day_key in day_keys:
+        d = datetime.date.fromisoformat(day_key)
+        iso = d.isocalendar()
+        periods.add(f"Q{(d.month - 1) // 3 + 1}-{d.year}")
+        periods.add(f"{iso[0]}-W{iso[1]:02d}")
+    return periods
+
+# --- Building ---
+
+def default_title(period_key):
+    """Chart title as the Quarterly page shows it: "Q1 Hours Distribution", "2026-W41 Hours Distribution"."""
+    label = period_key.split("-")[0] if period_key.startswith("Q") else period_key
+    return f"{label} Hours Distribution"
+
+def build_report(period_key, project_hours, title=None):
+    """A report for one period from its project_name/hours rows: metrics, breakdown and pie chart JSON."""
+    breakdown = project_hours.groupby("project_name")["hours"].sum().sort_values(ascending=False) if not project_hours.empty else pd.Series(dtype=float)
+    report = {
+        "period": period_key,
+        "kind": "quarter" if period_key.startswith("Q") else "week",
+        "total_hours": float(breakdown.sum()),
+        "most_active": breakdown.index[0] if not breakdown.empty else "N/A",
+        "breakdown": [{"project_name": name, "hours": round(float(h), 2)} for name, h in breakdown.items()],
+        "chart": None,
+    }
+    if not breakdown.empty:
+        fig = px.pie(breakdown.reset_index(), values="hours", names="project_name", title=title or default_title(period_key))
+        report["chart"] = fig.to_json()
+    return report
+
+def report_figure(report):
+    return pio.from_json(report["chart"]) if report.get("chart") else None
+
+def report_html(report):
+    """A standalone HTML page for a report (plotly.js from the CDN)."""
+    rows = "".join(f"<tr><td>{html.escape(str(b['project_name']))}</td><td>{b['hours']:.1f}</td></tr>" for b in report["breakdown"])
+    fig = report_figure(report)
+    chart = fig.to_html(full_html=False, include_plotlyjs="cdn") if fig else "<p>No data logged for this period.</p>"
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{report['period']} Report</title></head><body>"
+            f"<h1>{report['period']}</h1><p>Total Hours: {report['total_hours']:.1f} · Most Active: {html.escape(str(report['most_active']))}</p>"
+            f"<table><tr><th>Project</th><th>Hours</th></tr>{rows}</table>{chart}</body></html>")
+
+# --- Storage ---
+
+def load_reports(db, kind=None):
+    """Stored reports as {period_key: report}, optionally for one kind."""
+    query = db.collection(REPORTS_COLLECTION)
+    if kind:
+        query = query.where(field_path="kind", op_string="==", value=kind)
+    return {doc.id: doc.to_dict() for doc in query.stream(**call_options())}
+
+def save_reports(db, reports, sync=None):
+    """Stores reports keyed by period, in batches. With `sync` the version bump rides in the last batch."""
+    reports = list(reports)
+    for start in range(0, len(reports), BUMP_BATCH_SIZE):
+        batch = db.batch()
+        for report in reports[start:start + BUMP_BATCH_SIZE]:
+            batch.set(db.collection(REPORTS_COLLECTION).document(report["period"]), {**report, "generated_at": firestore.SERVER_TIMESTAMP})
+        if start + BUMP_BATCH_SIZE >= len(reports):
+            if sync is not None:
+                sync.bump(REPORTS_COLLECTION, batch=batch)
+            else:
+                bump_versions(db, REPORTS_COLLECTION, batch=batch)
+        batch.commit()
+    return len(reports)
+
+def invalidate_reports(db, day_keys, sync=None):
+    """Drops the stored reports of closed periods touching `day_keys` (after a backfill, edit or delete).
+
+    Returns the number of periods dropped; open periods cost nothing.
+    """
+    periods = {p for p in periods_for_days(day_keys) if is_closed(p)}
+    if not periods:
+        return 0
+    batch = db.batch()
+    for period in periods:
+        batch.delete(db.collection(REPORTS_COLLECTION).document(period))
+    if sync is not None:
+        sync.bump(REPORTS_COLLECTION, batch=batch)
+    else:
+        bump_versions(db, REPORTS_COLLECTION, batch=batch)
+    batch.commit()
+    return len(periods)
+
+def generate_reports(db, df_logs, kinds=tuple(PERIOD_KINDS), rebuild=False, html_dir=None, day_key=None):
+    """Materializes a report for every closed period in the logs that doesn't have one yet.
+
+    `df_logs` is the logs frame from load_frames(). With `html_dir`, a static
+    page per generated report is written there too. Returns the reports built.
+    """
+    day_key = day_key or current_keys()["day_key"]
+    built = []
+    for kind in kinds:
+        if df_logs.empty:
+            break
+        existing = {} if rebuild else load_reports(db, kind)
+        column = PERIOD_KINDS[kind]
+        for period_key, rows in df_logs.groupby(column):
+            if period_key in existing or not is_closed(period_key, day_key):
+                continue
+            built.append(build_report(period_key, rows[["project_name", "hours"]]))
+    if built:
+        save_reports(db, built)
+    if html_dir:
+        os.makedirs(html_dir, exist_ok=True)
+        for report in built:
+            with open(os.path.join(html_dir, f"{report['period']}.html"), "w", encoding="utf-8") as f:
+                f.write(report_html(report))
+    return built
+
+def main(argv=None):
+    from aggregates import load_frames
+
+    parser = argparse.ArgumentParser(description="Materialize weekly and quarterly reports for closed periods (run on demand or from cron).")
+    parser.add_argument("--kind", choices=list(PERIOD_KINDS), action="append", help="Only this period kind (repeatable; default: all)")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate reports that already exist")
+    parser.add_argument("--html-dir", help="Also write a static HTML page per report to this directory")
+    args = parser.parse_args(argv)
+
+    db = get_db()
+    df_logs, _ = load_frames(db)
+    built = generate_reports(db, df_logs, kinds=args.kind or tuple(PERIOD_KINDS), rebuild=args.rebuild, html_dir=args.html_dir)
+    print(f"Generated {len(built)} reports.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
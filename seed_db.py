@@ -1,6 +1,7 @@
 import streamlit as st
 from db_config import get_db
 from firebase_admin import firestore
+from cache_sync import bump_versions
 
 def seed_data():
     st.title("Database Seeder")
@@ -62,6 +63,7 @@ def seed_data():
                 current_step += 1
                 my_bar.progress(current_step / total_steps, text=progress_text)
                 
+            bump_versions(db, "pillars", "projects")
             my_bar.empty()
             st.success("Database seeded successfully!")
             
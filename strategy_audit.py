@@ -0,0 +1,176 @@
+import io
+import json
+import pandas as pd
+from firebase_admin import firestore
+from llm_gateway import GatewayBusy
+from cache_sync import BUMP_BATCH_SIZE
+
+AUDIT_MODEL = "gemini-2.5-flash"
+APPROVED, REJECTED, INVALID = "APPROVED", "REJECTED", "INVALID"
+MAX_PROMPT_TOKENS = 6000    # Proposal tokens per request; bigger lists are split across calls
+CHARS_PER_TOKEN = 4         # Rough estimate, good enough for budgeting
+
+# Accepted headers (lower-cased) for each proposal field.
+PROPOSAL_ALIASES = {
+    "name": ["name", "project", "project_name"],
+    "pillar_id": ["pillar", "pillar_id"],
+    "total_hours_budget": ["hours", "budget", "total_hours_budget"],
+    "quarter": ["quarter"],
+    "justification": ["justification", "why", "reason", "description"],
+}
+
+AUDIT_RULES = """
+You are a ruthless Investment Committee member for an AI Founder.
+Current Strategic Context: {context}
+
+Your Goal: Prevent Scope Creep.
+
+Rules for Approval:
+1. REJECT if 'The Cleanup (Debt)' hours are low but they want to add new features unrelated to debt.
+2. REJECT if the project is generic (e.g., 'Learn AI') instead of specific execution.
+3. REJECT if it violates the 'No New WIP' rule (unless it's critical debt fixing).
+4. APPROVE only if it directly contributes to: "AI for Finance Expert for Mid-sized companies" OR clearing Tech Debt.
+"""
+
+SINGLE_FORMAT = """
+Output Format: JSON only.
+{"status": "APPROVED" or "REJECTED", "reason": "Short, ruthless explanation."}
+"""
+
+BATCH_FORMAT = """
+You will receive several numbered proposals. Judge each one on its own merits.
+Output Format: JSON only, one entry per proposal, same ids.
+{"results": [{"id": 0, "status": "APPROVED" or "REJECTED", "reason": "Short, ruthless explanation."}]}
+"""
+
+def parse_proposals(text, default_pillar=None, default_quarter="Top Priority"):
+    """Reads a pasted table (tab-separated, as copied from a spreadsheet) or CSV into proposal dicts."""
+    text = text.strip()
+    if not text:
+        return []
+    sep = "\t" if "\t" in text.splitlines()[0] else ","
+    raw = pd.read_csv(io.StringIO(text), sep=sep, dtype=str, skipinitialspace=True).fillna("")
+    raw.columns = [str(c).strip().lower() for c in raw.columns]
+    cols = {}
+    for field, aliases in PROPOSAL_ALIASES.items():
+        match = next((a for a in aliases if a in raw.columns), None)
+        cols[field] = raw[match].str.strip() if match else pd.Series("", index=raw.index)
+    if (cols["name"] == "").all():
+        raise ValueError("No project name column (expected one of: " + ", ".join(PROPOSAL_ALIASES["name"]) + ")")
+
+    df = pd.DataFrame(cols)
+    if default_pillar:
+        df["pillar_id"] = df["pillar_id"].replace("", default_pillar)
+    df["quarter"] = df["quarter"].replace("", default_quarter)
+    df["total_hours_budget"] = pd.to_numeric(df["total_hours_budget"], errors="coerce").fillna(0).astype(int)
+    return df[df["name"] != ""].to_dict("records")
+
+def check_proposals(proposals, pillars, existing_names=()):
+    """Local checks before anything is sent to the model: returns an error string (or None) per proposal."""
+    taken = {n.strip().lower() for n in existing_names}
+    errors = []
+    for p in proposals:
+        key = p["name"].lower()
+        if key in taken:
+            errors.append("A project with this name already exists.")
+        elif not p["pillar_id"]:
+            errors.append("Missing pillar.")
+        elif p["pillar_id"] not in pillars:
+            errors.append(f"Unknown pillar '{p['pillar_id']}'.")
+        elif p["total_hours_budget"] <= 0:
+            errors.append("Hours must be a positive number.")
+        elif not p["justification"]:
+            errors.append("Missing justification.")
+        else:
+            errors.append(None)
+        taken.add(key)
+    return errors
+
+def _proposal_text(i, p):
+    return f"[{i}] Project: {p['name']}\nPillar: {p['pillar_id']}\nHours: {p['total_hours_budget']}\nJustification: {p['justification']}\n"
+
+def chunk_proposals(proposals, max_tokens=MAX_PROMPT_TOKENS):
+    """Splits proposals into consecutive chunks whose prompt text fits `max_tokens`.
+
+    Yields lists of (id, prompt text); ids are positions in `proposals`.
+    """
+    chunk, used = [], 0
+    for i, p in enumerate(proposals):
+        text = _proposal_text(i, p)
+        tokens = len(text) // CHARS_PER_TOKEN + 1
+        if chunk and used + tokens > max_tokens:
+            yield chunk
+            chunk, used = [], 0
+        chunk.append((i, text))
+        used += tokens
+    if chunk:
+        yield chunk
+
+def validate_results(response_text, ids):
+    """Maps each expected id to {"status", "reason"}; anything missing or malformed is INVALID."""
+    results = {i: {"status": INVALID, "reason": "No verdict returned."} for i in ids}
+    try:
+        data = json.loads(response_text)
+    except (TypeError, ValueError):
+        for r in results.values():
+            r["reason"] = "Response was not valid JSON."
+        return results
+    entries = data.get("results") if isinstance(data, dict) else data
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            i = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        status = str(entry.get("status", "")).upper()
+        if i in results and status in (APPROVED, REJECTED):
+            results[i] = {"status": status, "reason": str(entry.get("reason") or "")}
+    return results
+
+def audit_batch(gateway, session_id, context, proposals, model_name=AUDIT_MODEL, max_tokens=MAX_PROMPT_TOKENS, on_progress=None):
+    """Audits every proposal with one shared context: one JSON request per token-budget chunk.
+
+    Returns one {"status", "reason"} per proposal, in order.
+    """
+    system_instruction = AUDIT_RULES.format(context=context) + BATCH_FORMAT
+    verdicts = {}
+    for chunk in chunk_proposals(proposals, max_tokens):
+        ids = [i for i, _ in chunk]
+        prompt = "Proposals:\n\n" + "\n".join(text for _, text in chunk)
+        try:
+            response = gateway.generate(session_id, model_name, prompt, system_instruction=system_instruction,
+                                        generation_config={"response_mime_type": "application/json"})
+            verdicts.update(validate_results(response.text, ids))
+        except GatewayBusy:
+            raise
+        except Exception as e:
+            verdicts.update({i: {"status": INVALID, "reason": f"Audit call failed: {e}"} for i in ids})
+        if on_progress:
+            on_progress(len(verdicts), len(proposals))
+    return [verdicts[i] for i in range(len(proposals))]
+
+def commit_projects(db, proposals, sync=None, batch_size=BUMP_BATCH_SIZE):
+    """Creates the given proposals as Active projects in batched writes. Returns the number written.
+
+    With `sync` (a CacheSync), the projects version bump rides in the last batch.
+    """
+    written = 0
+    for start in range(0, len(proposals), batch_size):
+        chunk = proposals[start:start + batch_size]
+        batch = db.batch()
+        for p in chunk:
+            batch.set(db.collection("projects").document(), {
+                "name": p["name"],
+                "pillar_id": p["pillar_id"],
+                "total_hours_budget": p["total_hours_budget"],
+                "status": "Active",
+                "quarter": p["quarter"],
+                "visibility": True,
+                "created_at": firestore.SERVER_TIMESTAMP,
+            })
+        if sync is not None and start + batch_size >= len(proposals):
+            sync.bump("projects", batch=batch)
+        batch.commit()
+        written += len(chunk)
+    return written
@@ -0,0 +1,103 @@
+import argparse
+import datetime
+import os
+from zoneinfo import ZoneInfo
+import pandas as pd
+import streamlit as st
+from db_config import get_db
+
+TIME_KEY_FIELDS = ["day_key", "iso_week", "quarter_key"]
+DEFAULT_TIMEZONE = "UTC"
+BATCH_SIZE = 500  # Firestore batch write limit
+
+def get_timezone():
+    """Reporting time zone: NORTHSTAR_TIMEZONE env var, then `timezone` in secrets, else UTC."""
+    name = os.getenv("NORTHSTAR_TIMEZONE")
+    if not name:
+        try:
+            name = st.secrets.get("timezone")
+        except Exception:
+            name = None
+    return ZoneInfo(name or DEFAULT_TIMEZONE)
+
+def time_keys(dt, tz=None):
+    """Returns {'day_key': '2026-10-19', 'iso_week': '2026-W42', 'quarter_key': 'Q4-2026'} for a log date."""
+    tz = tz or get_timezone()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    local = dt.astimezone(tz)
+    iso_year, iso_week, _ = local.isocalendar()
+    return {
+        "day_key": local.strftime("%Y-%m-%d"),
+        "iso_week": f"{iso_year}-W{iso_week:02d}",
+        "quarter_key": f"Q{(local.month - 1) // 3 + 1}-{local.year}",
+    }
+
+def current_keys(tz=None):
+    """Time keys for 'now' in the reporting time zone."""
+    return time_keys(datetime.datetime.now(datetime.timezone.utc), tz)
+
+def add_time_keys(df, tz=None):
+    """Fills day_key/iso_week/quarter_key on a logs frame in one vectorized pass.
+
+    Stored keys win; only rows missing them (legacy docs) are derived from `date`.
+    """
+    if df.empty or "date" not in df.columns:
+        return df
+    tz = tz or get_timezone()
+    local = pd.to_datetime(df["date"], utc=True).dt.tz_convert(tz)
+    iso = local.dt.isocalendar()
+    derived = {
+        "day_key": local.dt.strftime("%Y-%m-%d"),
+        "iso_week": iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2),
+        "quarter_key": "Q" + local.dt.quarter.astype(str) + "-" + local.dt.year.astype(str),
+    }
+    for field, values in derived.items():
+        df[field] = df[field].fillna(values) if field in df.columns else values
+    return df
+
+def backfill_time_keys(dry_run=False, page_size=BATCH_SIZE, on_progress=None):
+    """Migration: writes time keys on every work_log that lacks them or has stale ones.
+
+    Pages with cursors and commits one batch per page. Returns (scanned, updated).
+    """
+    from export_logs import build_logs_query, iter_log_pages
+    from cache_sync import bump_versions
+
+    db = get_db()
+    tz = get_timezone()
+    scanned = updated = 0
+    for page, page_len in iter_log_pages(build_logs_query(db), page_size):
+        batch = db.batch()
+        pending = 0
+        for doc_id, d in page:
+            if not d.get("date"):
+                continue
+            keys = time_keys(d["date"], tz)
+            if any(d.get(f) != keys[f] for f in TIME_KEY_FIELDS):
+                batch.update(db.collection("work_logs").document(doc_id), keys)
+                pending += 1
+        if pending and not dry_run:
+            batch.commit()
+        scanned += page_len
+        updated += pending
+        if on_progress:
+            on_progress(scanned, updated)
+    if updated and not dry_run:
+        bump_versions(db, "work_logs")
+    return scanned, updated
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill day_key/iso_week/quarter_key on work_logs.")
+    parser.add_argument("--dry-run", action="store_true", help="Count docs that need keys without writing")
+    args = parser.parse_args(argv)
+
+    def report(scanned, updated):
+        print(f"\rScanned {scanned} logs, {updated} need keys", end="", flush=True)
+
+    scanned, updated = backfill_time_keys(dry_run=args.dry_run, on_progress=report)
+    verb = "Would update" if args.dry_run else "Updated"
+    print(f"\n{verb} {updated} of {scanned} logs (time zone: {get_timezone().key}).")
+
+if __name__ == "__main__":
+    main()